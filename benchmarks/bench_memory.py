@@ -0,0 +1,106 @@
+"""
+Memory footprint of core objects for a synthetic journal
+
+Builds transactions the way ReaderLedger does (fresh strings and containers for every parsed line) once with
+plain dictionary-backed classes, as the core classes used to be, and once with the compact core classes.
+
+Usage: python -m benchmarks.bench_memory [-n TRANSACTIONS]
+"""
+import argparse
+import decimal
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+from wallet_keeper.modules.core.dosh import Dosh
+from wallet_keeper.modules.core.transaction import Transaction
+from wallet_keeper.modules.core.transfer import Transfer
+
+accounts = ["Assets:Checking", "Expenses:Groceries", "Expenses:Rent", "Expenses:Insurance:Life", "Income:Salary"]
+
+
+class LegacyDosh(object):
+    def __init__(self, value: str = "0.0", currency: str = None):
+        self._value = decimal.Decimal(value)
+        self._currency = currency
+
+
+class LegacyTransfer(object):
+    def __init__(self, account, amount=None, price=None, labels=None, properties=None, comments=None):
+        self.account = account
+        self.amount = amount
+        self.price = price
+        self.labels = labels if labels else []
+        self.properties = properties if properties else {}
+        self.comments = comments if comments else []
+
+
+class LegacyTransaction(object):
+    def __init__(self, trans_date, book_date, name, labels, properties, comments, transfers):
+        self.trans_date = trans_date
+        self.book_date = book_date
+        self.name = name
+        self.labels = labels
+        self.properties = properties
+        self.comments = comments
+        self.transfers = transfers
+
+
+def build(n: int, transaction, transfer, dosh) -> list:
+    """
+    Build a synthetic journal
+
+    :param n: number of transactions
+    :param transaction: transaction class
+    :param transfer: transfer class
+    :param dosh: amount class
+    :return: list of transactions
+    """
+    d0 = datetime(2010, 1, 1)
+    transactions = []
+    for i in range(n):
+        value = "{}.{:02d}".format(i % 500, i % 100)
+        line = "{}    -{} EUR".format(accounts[0], value)  # mimic strings sliced out of a parsed line
+        account = line.split("  ")[0]
+        currency = line.split(" ")[-1]
+        transfers = [
+            transfer(account, dosh("-" + value, currency), dosh("-" + value, currency), [], {}, []),
+            transfer("".join(accounts[1 + i % 4]), None, None, [], {}, []),
+        ]
+        transactions.append(
+            transaction(d0 + timedelta(days=i % 5000), d0 + timedelta(days=i % 5000), "Payment",
+                        [], {}, [], transfers)
+        )
+    return transactions
+
+
+def measure(n: int, transaction, transfer, dosh) -> int:
+    """
+    Measure memory allocated by a synthetic journal
+
+    :return: bytes per transfer
+    """
+    gc.collect()
+    tracemalloc.start()
+    transactions = build(n, transaction, transfer, dosh)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del transactions
+
+    return size / (2 * n)
+
+
+def compact_transaction(*args):
+    return Transaction(*args, raw=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure memory per transfer")
+    parser.add_argument("-n", dest="n", type=int, default=1000000, help="Number of transactions")
+    args = parser.parse_args()
+
+    before = measure(args.n, LegacyTransaction, LegacyTransfer, LegacyDosh)
+    after = measure(args.n, compact_transaction, Transfer, Dosh)
+    print("transactions: {}".format(args.n))
+    print("before: {:.1f} bytes per transfer".format(before))
+    print("after:  {:.1f} bytes per transfer".format(after))
+    print("saved:  {:.1%}".format(1 - after / before))
@@ -0,0 +1,74 @@
+"""
+Parse throughput of ReaderLedger
+
+Scales tests/unit/input/ledger.ledger up synthetically by repeating its transactions with shifted dates, then
+reads the result with ReaderLedger and reports parsed lines per second.
+
+Usage: python -m benchmarks.bench_reader_ledger [-n REPEATS] [-r ROUNDS]
+"""
+import argparse
+import re
+import tempfile
+import time
+from pathlib import Path
+from wallet_keeper.modules.translator.readers.reader_ledger import ReaderLedger
+
+source = Path(__file__).parent.parent / "tests" / "unit" / "input" / "ledger.ledger"
+re_year = re.compile(r"([0-9][0-9][0-9][0-9])(-[0-9][0-9]-[0-9][0-9])")
+
+
+def scale(text: str, n: int) -> str:
+    """
+    Repeat journal transactions with shifted years
+
+    :param text: journal content
+    :param n: number of repeats
+    :return: scaled journal content
+    """
+    lines = text.splitlines(keepends=True)
+    start = next(i for i, line in enumerate(lines) if re_year.match(line))
+    header = "".join(lines[:start])
+    body = "".join(lines[start:])
+    if not body.endswith("\n\n"):
+        body += "\n"
+
+    chunks = [header]
+    for i in range(n):
+        chunks.append(re_year.sub(lambda m: "{}{}".format(int(m.group(1)) - i % 100, m.group(2)), body))
+
+    return "".join(chunks)
+
+
+def measure(path: Path, rounds: int) -> float:
+    """
+    Measure the best parse time
+
+    :param path: journal to parse
+    :param rounds: number of rounds
+    :return: seconds
+    """
+    best = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        ReaderLedger.read(path)
+        t = time.perf_counter() - t0
+        best = t if best is None else min(best, t)
+
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure ReaderLedger throughput")
+    parser.add_argument("-n", dest="n", type=int, default=2000, help="Number of repeats of the test journal")
+    parser.add_argument("-r", dest="rounds", type=int, default=3, help="Number of timing rounds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scaled.ledger"
+        path.write_text(scale(source.read_text(), args.n))
+        n_lines = len(path.read_text().splitlines())
+        seconds = measure(path, args.rounds)
+
+    print("lines:   {}".format(n_lines))
+    print("time:    {:.3f} s".format(seconds))
+    print("speed:   {:,.0f} lines/s".format(n_lines / seconds))
@@ -0,0 +1,86 @@
+"""
+Scaling of rule matching with the number of rules
+
+Generates rules like the usual categorisation rules (".*Shop 17.*" on the creditor name or the message, some with two
+fields or alternatives) and synthetic bank entries, then times RuleMatcher with and without the literal prefilter.
+
+Usage: python -m benchmarks.bench_rules [-n TRANSACTIONS] [-r RULES ...]
+"""
+import argparse
+import random
+import time
+from wallet_keeper.modules.core.transaction import Transaction
+from wallet_keeper.modules.translator.matcher import RuleMatcher
+from wallet_keeper.utils.collection import *
+
+
+def make_rules(n: int) -> dict:
+    """
+    Make synthetic rules
+
+    :param n: number of rules
+    :return: rules
+    """
+    rules = {}
+    for i in range(n):
+        if i % 10 == 0:
+            r = [{cs_creditor_name: ".*Shop {}.*".format(i)}, {cs_message: ".*order {} .*".format(i)}]
+        elif i % 10 == 1:
+            r = {cs_creditor_name: "Shop {}.*".format(i), cs_message: ".*invoice.*"}
+        elif i % 2 == 0:
+            r = {cs_creditor_name: ".*Shop {}.*".format(i)}
+        else:
+            r = {cs_message: ".*contract {}.*".format(i)}
+        rules["Rule {}".format(i)] = {cs_rule: r, cs_from: "Assets:Checking", cs_to: "Expenses:Rule{}".format(i)}
+
+    return rules
+
+
+def make_transactions(n: int, n_rules: int) -> list:
+    """
+    Make synthetic bank entries, most of them matching some rule
+
+    :param n: number of transactions
+    :param n_rules: number of rules to draw counterparties from
+    :return: list of transactions
+    """
+    rng = random.Random(0)
+    transactions = []
+    for _ in range(n):
+        k = rng.randrange(int(n_rules * 1.2))  # some entries match nothing
+        data = {
+            cs_creditor_name: "Shop {} GmbH".format(k) if k % 2 == 0 else "Company {}".format(k),
+            cs_debtor_name: "Oompa Loompa",
+            cs_message: "Payment for contract {} invoice 2023-{:02d}".format(k, rng.randrange(1, 13)),
+        }
+        transactions.append(Transaction(None, None, "Raw", [], data, [], [], raw=True))
+
+    return transactions
+
+
+def measure(rules: dict, transactions: list, prefilter: bool) -> float:
+    """
+    Measure matching time
+
+    :return: seconds per transaction
+    """
+    matcher = RuleMatcher(rules, prefilter=prefilter)
+    t0 = time.perf_counter()
+    matcher.match_all(transactions)
+    return (time.perf_counter() - t0) / len(transactions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure rule matching time against the number of rules")
+    parser.add_argument("-n", dest="n", type=int, default=5000, help="Number of transactions")
+    parser.add_argument("-r", dest="rules", type=int, nargs="+", default=[50, 100, 200, 400, 800, 1600],
+                        help="Numbers of rules")
+    args = parser.parse_args()
+
+    print("{:>6} {:>16} {:>16}".format("rules", "plain [us/tr]", "prefilter [us/tr]"))
+    for n_rules in args.rules:
+        rules = make_rules(n_rules)
+        transactions = make_transactions(args.n, n_rules)
+        plain = measure(rules, transactions, False)
+        fused = measure(rules, transactions, True)
+        print("{:>6} {:>16.1f} {:>16.1f}".format(n_rules, plain * 1e6, fused * 1e6))
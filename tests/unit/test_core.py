@@ -0,0 +1,215 @@
+import unittest
+from datetime import datetime
+from decimal import Decimal
+import numpy
+from wallet_keeper.modules.core.dosh import Dosh
+from wallet_keeper.modules.core.cents import Cents, CentsArray
+from wallet_keeper.modules.core.transaction import Transaction
+from wallet_keeper.modules.core.transfer import Transfer
+from wallet_keeper.modules.core.wallet import Wallet
+
+
+def make_wallet() -> Wallet:
+    def trans(date, name, account, value, labels=None, properties=None):
+        return Transaction(
+            date, date, name,
+            labels if labels else [], properties if properties else {}, [],
+            [Transfer("Assets:Checking", Dosh(str(-value), "EUR"), Dosh(str(-value), "EUR")),
+             Transfer(account)]
+        )
+
+    transactions = [
+        trans(datetime(2021, 3, 5), "Rent", "Expenses:Rent", Decimal("800.00"), properties={"Group": "Common"}),
+        trans(datetime(2021, 1, 12), "Groceries", "Expenses:Food:Groceries", Decimal("31.60"), labels=["Food"]),
+        trans(datetime(2021, 2, 1), "Salary", "Income:Salary", Decimal("-2500.00")),
+        trans(datetime(2021, 3, 5), "Bar", "Expenses:Food:Bars", Decimal("21.00")),
+        trans(datetime(2021, 4, 30), "Dental", "Expenses:Insurance:Dental", Decimal("19.90")),
+    ]
+    labels = {
+        "Assets:Checking": "liquid",
+        "Expenses:Rent": "living",
+        "Expenses:Food:Groceries": "living",
+        "Expenses:Food:Bars": "fun",
+        "Income:Salary": "income",
+        "Expenses:Insurance:Dental": "insurance",
+    }
+
+    return Wallet(transactions, labels)
+
+
+class TestWallet(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.wallet = make_wallet()
+
+    def test_transfers_range(self):
+        df, df_tags, df_properties, df_comments = self.wallet.get_pandas_transfers(
+            start_date=datetime(2021, 2, 1), end_date=datetime(2021, 3, 5))
+
+        self.assertEqual(list(df["name"]), ["Salary", "Salary", "Rent", "Rent", "Bar", "Bar"])
+        self.assertEqual(list(df["category"]), ["liquid", "income", "liquid", "living", "liquid", "fun"])
+        self.assertEqual(df["price"].sum(), Decimal("0"))
+        self.assertEqual(len(df_properties), len(df))
+        self.assertEqual(list(df_properties["Group"].notnull()), [False, False, True, True, False, False])
+        self.assertEqual(len(df_tags.columns), 0)
+
+    def test_transfers_empty_range(self):
+        df, df_tags, df_properties, df_comments = self.wallet.get_pandas_transfers(
+            start_date=datetime(2022, 1, 1))
+
+        self.assertEqual(len(df), 0)
+        self.assertEqual(len(df_comments), 0)
+
+    def test_transactions_range(self):
+        transactions = self.wallet.get_transactions(start_date=datetime(2021, 1, 13), end_date=datetime(2021, 3, 5))
+
+        self.assertEqual([t.name for t in transactions], ["Salary", "Rent", "Bar"])
+        self.assertEqual(self.wallet.get_time_span(), (datetime(2021, 1, 12), datetime(2021, 4, 30)))
+
+    def test_totals_hierarchy(self):
+        df = self.wallet.get_pandas_totals(value="price", hierarchy=True)
+        totals = {r["account"]: (r["amount"], r["depth"], r["parent"]) for r in df.to_dict(orient="records")}
+
+        self.assertEqual(totals["Expenses"], (Decimal("872.50"), 0, ""))
+        self.assertEqual(totals["Expenses:Food"], (Decimal("52.60"), 1, "Expenses"))
+        self.assertEqual(totals["Expenses:Food:Bars"], (Decimal("21.00"), 2, "Expenses:Food"))
+        self.assertEqual(totals["Assets"], totals["Assets:Checking"][:1] + (0, ""))
+
+    def test_extend_duplicates(self):
+        def entry(date, amount, message):
+            properties = {"value date": date, "amount": amount, "currency": "EUR", "account": "DE01",
+                          "debtor account": "DE02", "message": message}
+            return Transaction(datetime.strptime(date, "%Y-%m-%d"), None, "Transfer", [], properties, [],
+                               [Transfer("Assets:Checking", Dosh(amount, "EUR"), Dosh(amount, "EUR"))], raw=True)
+
+        first = [entry("2021-03-01", "10.00", "Coffee"), entry("2021-03-01", "10.00", "Coffee"),
+                 entry("2021-03-02", "5.00", "Bread")]
+        second = [entry("2021-03-01", "10.00", "Coffee"), entry("2021-03-02", "5.00", "Bread"),
+                  entry("2021-03-02", "5.00", "Milk"), entry("2021-03-03", "7.00", "Bread")]
+
+        wallet = Wallet(list(first), {})
+        self.assertEqual(wallet.get_time_span()[1], datetime(2021, 3, 2))
+        skipped = wallet.extend(second)
+
+        self.assertEqual([t.properties["message"] for t in skipped], ["Coffee", "Bread"])
+        self.assertEqual(len(wallet.transactions), 5)
+        self.assertEqual(wallet.fingerprints.count(first[0]), 2)
+        self.assertEqual(wallet.get_time_span()[1], datetime(2021, 3, 3))
+        self.assertEqual(len(wallet.extend(second)), 4)
+        self.assertEqual(len(wallet.transactions), 5)
+
+
+class TestCube(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.wallet = make_wallet()
+
+    def test_totals(self):
+        cube = self.wallet.cube
+        self.assertEqual(cube.get_totals().to_dict(orient="records"),
+                         self.wallet.get_pandas_totals(value="price", hierarchy=True).to_dict(orient="records"))
+
+        df = cube.get_totals(start_date=datetime(2021, 2, 1), end_date=datetime(2021, 3, 1), hierarchy=False)
+        totals = dict(zip(df["account"], df["amount"]))
+        self.assertEqual(totals, {"Assets:Checking": Decimal("1679.00"), "Expenses:Food:Bars": Decimal("21.00"),
+                                  "Expenses:Rent": Decimal("800.00"), "Income:Salary": Decimal("-2500.00")})
+
+    def test_monthly(self):
+        cube = self.wallet.cube
+        df = cube.get_monthly(start_date=datetime(2020, 12, 15), end_date=datetime(2021, 4, 1))
+        self.assertEqual(len(df), 6 * 5)
+        self.assertEqual(df["date"].iloc[0], datetime(2020, 12, 1))
+        self.assertAlmostEqual(df["total"].sum(), 0.0)
+
+        df = cube.get_monthly(start_date=datetime(2021, 1, 1), end_date=datetime(2021, 4, 1), hierarchy=True,
+                              cumulative=True)
+        food = df[df["account"] == "Expenses:Food"]
+        self.assertEqual(list(food["total"]), [31.6, 31.6, 52.6, 52.6])
+
+        df = cube.get_monthly_by(self.wallet.account_labels, start_date=datetime(2021, 3, 1),
+                                 end_date=datetime(2021, 3, 31))
+        self.assertEqual(dict(zip(df["label"], df["total"])),
+                         {"fun": 21.0, "liquid": -821.0, "living": 800.0})
+        self.assertEqual(len(cube.get_monthly(start_date=datetime(2022, 1, 1))), 0)
+
+
+class TestBalance(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.wallet = make_wallet()
+
+    def test_balance(self):
+        index = self.wallet.balances
+        self.assertEqual(index.balance("Assets:Checking", datetime(2021, 3, 4)), {"EUR": Decimal("2468.40")})
+        self.assertEqual(index.balance("Assets:Checking", datetime(2021, 3, 5)), {"EUR": Decimal("1647.40")})
+        self.assertEqual(index.balance("Assets:Checking", datetime(2020, 1, 1)), {"EUR": Decimal("0")})
+        self.assertEqual(index.balance("Expenses", children=True), {"EUR": Decimal("872.50")})
+        self.assertEqual(index.balance("Expenses"), {})
+        self.assertEqual(index.change("Expenses:Food", datetime(2021, 1, 12), datetime(2021, 3, 5), children=True),
+                         {"EUR": Decimal("52.60")})
+
+        history = index.get_history("Assets:Checking", [datetime(2021, 1, 1), datetime(2021, 1, 12),
+                                                        datetime(2021, 4, 30)])
+        self.assertEqual(list(history["balance"]), [0.0, -31.6, 1627.5])
+
+    def test_get_balances(self):
+        for at in [None, datetime(2021, 3, 31), datetime(2020, 12, 31)]:
+            balances = self.wallet.get_balances(at=at, hierarchy=True)
+            totals = self.wallet.get_pandas_totals(end_date=at, hierarchy=True)
+            self.assertEqual(balances.to_dict(orient="records"), totals.to_dict(orient="records"))
+
+
+class TestCompact(unittest.TestCase):
+    def test_shared_containers(self):
+        a = Transfer("".join(["Assets:", "Checking"]))
+        b = Transfer("Assets:Checking", Dosh("1.00", "EUR"), Dosh("1.00", "EUR"))
+
+        self.assertIs(a.account, b.account)
+        self.assertIs(a.properties, b.properties)
+        self.assertRaises(TypeError, lambda: a.properties.update({"Group": "Common"}))
+        self.assertRaises(AttributeError, lambda: setattr(b.amount, "other", 1))
+
+
+class TestCents(unittest.TestCase):
+    def test_arithmetic(self):
+        a = Cents("12.34", "EUR")
+        b = Cents.from_dosh(Dosh("0.66", "EUR"))
+
+        self.assertEqual(a + b, Cents("13", "EUR"))
+        self.assertEqual((a - b).units, 1168)
+        self.assertEqual((a + b).to_dosh(), Dosh("13.00", "EUR"))
+        self.assertRaises(ValueError, lambda: a + Cents("1", "USD"))
+        self.assertRaises(ValueError, lambda: Cents("0.001", "EUR"))
+
+    def test_array(self):
+        values = [Decimal("1.25"), Decimal("-0.5"), Decimal("0.0001"), None]
+        array = CentsArray.from_values(values, numpy.array([0, 0, 1, 0]), numpy.array(["EUR", "BALLS"], dtype=object))
+
+        self.assertEqual(array.units.dtype, numpy.int64)
+        self.assertEqual(list(array.get_decimals()), [Decimal("1.25"), Decimal("-0.5"), Decimal("0.0001"), 0])
+        totals = array.sum()
+        self.assertEqual(totals["EUR"], Cents("0.75", "EUR"))
+        self.assertEqual(totals["BALLS"].value, Decimal("0.0001"))
+
+    def test_array_overflow(self):
+        units = numpy.array([2 ** 62, 2 ** 62, 1], dtype=numpy.int64)
+        array = CentsArray(units, numpy.array([1, 1, 1]), numpy.array([None, "BALLS"], dtype=object),
+                           numpy.array([2, 4], dtype=numpy.int64))
+
+        self.assertEqual(array.sum()["BALLS"].units, 2 ** 63 + 1)
+
+    def test_totals_paths(self):
+        trans = Transaction(datetime(2021, 1, 1), None, "Shopping", [], {}, [],
+                            [Transfer("Assets:Checking", Dosh("-10.00", "EUR"), Dosh("-10.00", "EUR")),
+                             Transfer("Expenses:Food", None, None)], raw=True)
+        store = Wallet([trans], {}).store
+        cents = store.get_pandas_totals()
+        store.amount_cents = None
+        decimals = store.get_pandas_totals()
+
+        self.assertEqual(cents.to_dict(orient="records"), decimals.to_dict(orient="records"))
+        self.assertEqual(list(cents["account"]), ["Assets:Checking"])
+
+
+if __name__ == '__main__':
+    unittest.main()
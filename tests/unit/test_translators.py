@@ -4,11 +4,21 @@ from pathlib import Path
 
 from wallet_keeper.modules.translator.factory_reader import factory as fr
 from wallet_keeper.modules.translator.factory_writer import factory as fw
-from wallet_keeper.modules.translator.readers.reader_ledger import ReaderLedger
+from wallet_keeper.modules.translator.readers.reader_ledger import ReaderLedger, CheckpointStore
+from wallet_keeper.modules.translator.readers.cache_ledger import JournalCache
 from wallet_keeper.modules.translator.readers.reader_camt52v8 import ReaderCAMT52v8
 from wallet_keeper.modules.translator.writers.writer_ledger import WriterLedger
 from wallet_keeper.utils.collection import *
-from wallet_keeper.modules.translator.processing import process_wallet
+from wallet_keeper.modules.translator.processing import process_wallet, RuleCache
+from wallet_keeper.modules.translator.readers.tokenizer_ledger import find_dates, parse_date, split_comments, \
+    split_transfer
+from wallet_keeper.utils.watcher import FileWatcher
+from wallet_keeper.modules.translator.matcher import RuleMatcher, LiteralScanner, literal_prefix, required_literal
+from wallet_keeper.modules.core.transaction import Transaction
+from wallet_keeper.modules.core.wallet import Wallet
+from wallet_keeper.utils.xml_util import PathSelector, resolve_path
+import xml.etree.ElementTree as ET
+from datetime import datetime
 import filecmp
 import shutil
 
@@ -18,12 +28,9 @@ class TestParser(unittest.TestCase):
     def setUpClass(cls):
         cls.update = False
 
-    def test_camt52v8_to_ledger(self):
-        prefix = "camt52v8_to_ledger-"
-        reader = fr.create(ReaderCAMT52v8.format)
-        writer = fw.create(WriterLedger.format)
-
-        rules = {
+    @staticmethod
+    def _camt_rules() -> dict:
+        return {
             "Dental Insurance": {
                 cs_rule: {cs_creditor_name: ".*Krakenversicherung.*"},
                 cs_from: "Assets:Checking",
@@ -82,6 +89,13 @@ class TestParser(unittest.TestCase):
             }
         }
 
+    def test_camt52v8_to_ledger(self):
+        prefix = "camt52v8_to_ledger-"
+        reader = fr.create(ReaderCAMT52v8.format)
+        writer = fw.create(WriterLedger.format)
+
+        rules = self._camt_rules()
+
         p = Path(os.path.dirname(__file__))
         test_files = list(p.glob("input/camt52v8.xml"))
         out_dir = p / "output"
@@ -104,6 +118,42 @@ class TestParser(unittest.TestCase):
                 if not filecmp.cmp(test_file, ref_file):
                     raise AssertionError("Test file {} doesn't match the reference {}!!".format(test_file, ref_file))
 
+    def test_camt52v8_parallel_rules(self):
+        reader = fr.create(ReaderCAMT52v8.format)
+        file = Path(os.path.dirname(__file__)) / "input" / "camt52v8.xml"
+
+        serial_rules = self._camt_rules()
+        parallel_rules = self._camt_rules()
+        serial = process_wallet(reader.read(file), serial_rules)
+        wallet = reader.read(file)
+        transactions = list(wallet.transactions)
+        parallel = process_wallet(wallet, parallel_rules, workers=2)
+
+        self.assertEqual(self._dump(parallel), self._dump(serial))
+        self.assertTrue(all(a is b for a, b in zip(parallel.transactions, transactions)))  # updated in place
+        self.assertEqual(parallel_rules, serial_rules)
+        self.assertGreater(sum(t.name != "Raw" for t in parallel.transactions), 0)
+
+    def test_iter_read(self):
+        p = Path(os.path.dirname(__file__)) / "input"
+        for reader, file in [(fr.create(ReaderCAMT52v8.format), p / "camt52v8.xml"),
+                             (fr.create(ReaderLedger.format), p / "ledger.ledger")]:
+            iterator = reader.iter_read(file)
+            self.assertFalse(isinstance(iterator, list))
+            self.assertEqual(self._dump(Wallet(list(iterator))), self._dump(reader.read(file)))
+
+    def test_ledger_extend(self):
+        reader = fr.create(ReaderLedger.format)
+        file = Path(os.path.dirname(__file__)) / "input" / "ledger.ledger"
+
+        # Parsed ledger transactions are fingerprinted by their transfers, a second import adds nothing
+        wallet = Wallet([], {})
+        self.assertEqual(wallet.extend(reader.read(file).transactions), [])
+        count = len(wallet.transactions)
+        skipped = wallet.extend(reader.read(file).transactions)
+        self.assertEqual(len(skipped), count)
+        self.assertEqual(len(wallet.transactions), count)
+
     def test_ledger_to_ledger(self):
         prefix = "ledger_to_ledger-"
         reader = fr.create(ReaderLedger.format)
@@ -130,5 +180,345 @@ class TestParser(unittest.TestCase):
                 if not filecmp.cmp(test_file, ref_file):
                     raise AssertionError("Test file {} doesn't match the reference {}!!".format(test_file, ref_file))
 
+    def test_ledger_parallel_write(self):
+        p = Path(os.path.dirname(__file__))
+        out_dir = p / "output"
+        os.makedirs(out_dir, exist_ok=True)
+
+        wallet = fr.create(ReaderLedger.format).read(p / "input" / "ledger.ledger")
+        writer = fw.create(WriterLedger.format)
+        serial = writer.write(wallet, out_dir, "ledger_serial-")
+        parallel = writer.write(wallet, out_dir, "ledger_parallel-", parallel=True, workers=2)
+
+        self.assertGreater(len(serial), 1)
+        self.assertEqual([f.name.split("-", 1)[1] for f in parallel], [f.name.split("-", 1)[1] for f in serial])
+        for a, b in zip(serial, parallel):
+            self.assertTrue(filecmp.cmp(a, b, shallow=False), "{} differs from {}".format(b, a))
+
+    @staticmethod
+    def _split_includes(prefix: str) -> (Path, int):
+        """
+        Write one included file per transaction of the input ledger, with account declarations between them
+
+        :param prefix: prefix of the generated files
+        :return: master file and number of included files
+        """
+        p = Path(os.path.dirname(__file__))
+        out_dir = p / "output"
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+
+        with open(p / "input" / "ledger.ledger", "r") as f:
+            blocks = [b for b in f.read().split("\n\n") if b.strip()]
+
+        master = out_dir / "{}master".format(prefix)
+        with open(master, "w") as f:
+            for i, block in enumerate(blocks):
+                name = "{}{}".format(prefix, i)
+                with open(out_dir / name, "w") as g:
+                    g.write("account Assets:Checking ; #{}\n\n{}\n".format(i, block))
+                f.write("include {}\n".format(name))
+
+        return master, len(blocks)
+
+    @staticmethod
+    def _dump(wallet) -> list:
+        return [(t.trans_date, t.book_date, t.name, list(t.labels), dict(t.properties), list(t.comments),
+                 [(x.account, x.amount, x.price, list(x.labels), dict(x.properties), list(x.comments))
+                  for x in t.transfers])
+                for t in wallet.transactions]
+
+    def test_ledger_parallel_includes(self):
+        reader = fr.create(ReaderLedger.format)
+        master, n = self._split_includes("ledger_parallel-")
+
+        sequential = reader.read(master)
+        parallel = reader.read(master, parallel=True, workers=2)
+
+        self.assertEqual(len(sequential.transactions), 6)
+        self.assertEqual(self._dump(parallel), self._dump(sequential))
+        self.assertEqual(parallel.account_labels, sequential.account_labels)
+        self.assertEqual(parallel.account_labels, {"Assets:Checking": str(n - 1)})
+
+    def test_ledger_cache(self):
+        reader = fr.create(ReaderLedger.format)
+        master, n = self._split_includes("ledger_cache-")
+        cache = master.parent / "ledger_cache"
+        shutil.rmtree(cache, ignore_errors=True)
+
+        reference = reader.read(master)
+        cold = reader.read(master, cache=cache)
+        self.assertEqual(len(list(cache.glob("*.pickle"))), n + 1)
+
+        # Unchanged content with a new modification time is still served from the cache
+        os.utime(master.parent / "ledger_cache-0", ns=(0, 0))
+        warm = reader.read(master, cache=cache)
+        self.assertEqual(self._dump(cold), self._dump(reference))
+        self.assertEqual(self._dump(warm), self._dump(reference))
+
+        # Changed included file is parsed again
+        with open(master.parent / "ledger_cache-1", "a") as f:
+            f.write("\n2024-01-01 Appended\n    Assets:Checking    -1.00 EUR\n    Expenses:Rent\n")
+        changed = reader.read(master, cache=cache)
+        self.assertEqual(self._dump(changed), self._dump(reader.read(master)))
+        self.assertEqual(len(changed.transactions), len(reference.transactions) + 1)
+        self.assertEqual(changed.account_labels, reference.account_labels)
+
+        # The master entry refers to the included files instead of storing their transactions again
+        journal_cache = JournalCache(cache)
+        segments = journal_cache._load_result(master, True)[0]
+        self.assertEqual(segments, [master.parent / "ledger_cache-{}".format(i) for i in range(n)])
+
+        # A file changed while it is parsed is not served from the cache afterwards
+        included = master.parent / "ledger_cache-2"
+        snapshot = journal_cache.snapshot(included)
+        result = reader._read(included)
+        with open(included, "a") as f:
+            f.write("\n2024-01-02 Appended\n    Assets:Checking    -2.00 EUR\n    Expenses:Rent\n")
+        journal_cache.store(included, True, snapshot, [], result)
+        self.assertIsNone(JournalCache(cache).load(included, True))
+        self.assertEqual(len(reader.read(master, cache=cache).transactions), len(reference.transactions) + 2)
+
+    def test_ledger_incremental(self):
+        reader = fr.create(ReaderLedger.format)
+        p = Path(os.path.dirname(__file__))
+        path = p / "output" / "ledger_incremental"
+        if not os.path.exists(path.parent):
+            os.makedirs(path.parent)
+
+        with open(p / "input" / "ledger.ledger", "r") as f:
+            blocks = [b for b in f.read().split("\n\n") if b.strip()]
+
+        # Grow the file by one transaction at a time
+        text = ""
+        for block in blocks:
+            text += block + "\n\n"
+            with open(path, "w") as f:
+                f.write(text)
+
+            incremental = reader.read(path, incremental=True)
+            full = reader.read(path)
+            self.assertEqual(self._dump(incremental), self._dump(full))
+            self.assertEqual(incremental.account_labels, full.account_labels)
+
+        offset = reader.checkpoints.get((path, True)).offset
+        self.assertGreater(offset, 0)
+        self.assertFalse(text[offset:].strip())  # checkpoint is after the last transaction
+
+        # Changed prefix falls back to a full parse
+        with open(path, "w") as f:
+            f.write(text.replace("Groceries", "Food", 1))
+        incremental = reader.read(path, incremental=True)
+        self.assertEqual(self._dump(incremental), self._dump(reader.read(path)))
+        self.assertEqual(incremental.transactions[0].name, "Food")
+
+    def test_checkpoint_eviction(self):
+        store = CheckpointStore(size=2)
+        for key in ["a", "b"]:
+            store.put((key, True), key.upper())
+        self.assertEqual(store.get(("a", True)), "A")
+        store.put(("c", True), "C")
+
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.get(("b", True)))
+        self.assertEqual(store.get(("a", True)), "A")
+
+    def test_ledger_incremental_budget(self):
+        reader = fr.create(ReaderLedger.format)
+        path = Path(os.path.dirname(__file__)) / "output" / "ledger_incremental_budget"
+        os.makedirs(path.parent, exist_ok=True)
+
+        # The last transaction boundary follows the budget block, the rent is not closed by a blank line yet
+        rent = "2021-03-01 Rent\n    Expenses:Rent    800.00 EUR\n    Assets:Checking\n"
+        with open(path, "w") as f:
+            f.write("~ Monthly\n    Expenses:Rent    800.00 EUR\n    Assets:Checking\n\n" + rent)
+        reader.read(path, incremental=True)
+
+        # The transfer pending after the budget block must not be lost when resuming
+        with open(path, "a") as f:
+            f.write("\n" + rent.replace("03", "04", 1))
+        incremental = reader.read(path, incremental=True)
+        full = reader.read(path)
+        self.assertEqual(self._dump(incremental), self._dump(full))
+        self.assertEqual(len(incremental.transactions), 2)
+
+    def test_ledger_incremental_copies(self):
+        reader = fr.create(ReaderLedger.format)
+        path = Path(os.path.dirname(__file__)) / "output" / "ledger_incremental_copies"
+        os.makedirs(path.parent, exist_ok=True)
+
+        rent = "2021-03-01 Rent\n    Expenses:Rent    800.00 EUR\n    Assets:Checking\n\n"
+        with open(path, "w") as f:
+            f.write(rent)
+        first = reader.read(path, incremental=True)
+        first.transactions[0].name = "Modified"
+        first.transactions[0].transfers[0].account = "Modified"
+
+        with open(path, "a") as f:
+            f.write(rent.replace("03", "04", 1))
+        second = reader.read(path, incremental=True)
+        third = reader.read(path, incremental=True)
+        self.assertEqual(self._dump(second), self._dump(reader.read(path)))
+        self.assertIsNot(second.transactions[0], third.transactions[0])
+
+    def test_ledger_watch(self):
+        reader = fr.create(ReaderLedger.format)
+        master, n = self._split_includes("ledger_watch-")
+        self.assertEqual(ReaderLedger.find_files(master)[1:],
+                         [master.parent / "ledger_watch-{}".format(i) for i in range(n)])
+
+        wallets = [reader.read(master, incremental=True)]
+        watcher = FileWatcher(lambda: ReaderLedger.find_files(master),
+                              lambda: wallets.append(reader.read(master, incremental=True)))
+        self.assertFalse(watcher.poll())
+
+        with open(master.parent / "ledger_watch-2", "a") as f:
+            f.write("\n2024-01-01 Appended\n    Assets:Checking    -1.00 EUR\n    Expenses:Rent\n")
+        self.assertTrue(watcher.poll())
+        self.assertFalse(watcher.poll())
+
+        self.assertEqual(len(wallets), 2)
+        self.assertEqual(len(wallets[1].transactions), len(wallets[0].transactions) + 1)
+        self.assertEqual(self._dump(wallets[1]), self._dump(reader.read(master)))
+
+
+class TestTokenizerLedger(unittest.TestCase):
+    def test_dates(self):
+        self.assertEqual(find_dates("2023-12-24=2023-12-21 Groceries"), ["2023-12-24", "2023-12-21"])
+        self.assertEqual(find_dates("    Expenses:Groceries"), [])
+        self.assertEqual(parse_date("2023-12-21"), datetime(2023, 12, 21))
+
+    def test_comments(self):
+        self.assertEqual(split_comments("    ; Group: Common"), ([], {"Group": "Common"}, []))
+        self.assertEqual(split_comments("    ; :Food:Junk Stuff:"), (["Food", "Junk Stuff"], {}, []))
+        self.assertEqual(split_comments("    ; plain note"), ([], {}, ["plain note"]))
+        self.assertEqual(split_comments("    Expenses:Rent"), ([], {}, []))
+
+    def test_transfer(self):
+        account, fields, l, t, c = split_transfer("Assets:Checking      -24.24 EUR ; Shop: Aldi")
+        self.assertEqual(account, "Assets:Checking")
+        self.assertEqual(fields, ["-24.24", "EUR"])
+        self.assertEqual((l, t, c), ([], {"Shop": "Aldi"}, []))
+
+        account, fields, l, t, c = split_transfer("Equity:Securities:Fonds    1.0000 BALLS @ 250.0000 EUR")
+        self.assertEqual(account, "Equity:Securities:Fonds")
+        self.assertEqual(fields, ["1.0000", "BALLS", "@", "250.0000", "EUR"])
+
+
+class TestRuleMatcher(unittest.TestCase):
+    @staticmethod
+    def _transaction(creditor, message):
+        return Transaction(None, None, "Raw", [], {cs_creditor_name: creditor, cs_message: message}, [], [], raw=True)
+
+    def test_literal_prefix(self):
+        self.assertEqual(literal_prefix("aldi"), "aldi")
+        self.assertEqual(literal_prefix("aldis?.*"), "aldi")
+        self.assertEqual(literal_prefix(".*aldi.*"), "")
+        self.assertEqual(literal_prefix("aldi|rewe"), "")
+        self.assertEqual(literal_prefix("x\\.y"), "x")
+
+    def test_required_literal(self):
+        self.assertEqual(required_literal(".*aldi.*"), "aldi")
+        self.assertEqual(required_literal(".*isin depp123456.*"), "isin depp123456")
+        self.assertEqual(required_literal("ck *([0-9],[0-9]) stuck"), " stuck")
+        self.assertEqual(required_literal(".*(aldi|rewe).*"), "")
+        self.assertEqual(required_literal("aldi|rewe"), "")
+        self.assertEqual(required_literal("[a-z]+ gmbh\\."), " gmbh.")
+
+        # Character codes are no literal text
+        self.assertEqual(required_literal(".*\\x61ldi.*"), "ldi")
+        self.assertEqual(required_literal(".*\\u00fcber.*"), "ber")
+        self.assertEqual(required_literal(".*\\N{LATIN SMALL LETTER U WITH DIAERESIS}ber.*"), "ber")
+        self.assertEqual(required_literal(".*\\141ldi.*"), "ldi")
+
+    def test_escaped_codes(self):
+        rules = {
+            "Hex": {cs_rule: {cs_creditor_name: ".*\\x61ldi.*"}},
+            "Unicode": {cs_rule: {cs_creditor_name: ".*\\u00fcber.*"}},
+            "Name": {cs_rule: {cs_creditor_name: ".*gr\\N{LATIN SMALL LETTER O WITH DIAERESIS}sse.*"}},
+            "Octal": {cs_rule: {cs_creditor_name: ".*\\162ewe.*"}},
+        }
+        transactions = [
+            self._transaction("ALDI Sued", "x"),
+            self._transaction("Uber Trip", "x"),
+            self._transaction("Über Trip", "x"),
+            self._transaction("Größe", "x"),
+            self._transaction("REWE", "x"),
+        ]
+
+        expected = RuleMatcher(rules, prefilter=False).match_all(transactions)
+        self.assertEqual(RuleMatcher(rules).match_all(transactions), expected)
+        self.assertEqual(expected[:3] + expected[4:], ["Hex", None, "Unicode", "Octal"])
+
+    def test_literal_scanner(self):
+        scanner = LiteralScanner(["aldi", "aldi sued", "di s", "rewe"])
+        self.assertEqual(scanner.scan("big aldi sued store"), {"aldi", "aldi sued", "di s"})
+        self.assertEqual(scanner.scan("aldi nord"), {"aldi"})
+        self.assertEqual(scanner.scan("lidl"), set())
+
+    def test_first_rule_wins(self):
+        rules = {
+            "Groceries": {cs_rule: {cs_creditor_name: "Aldi.*", cs_message: ".*food.*"}},
+            "Rent": {cs_rule: [{cs_message: ".*Miete.*"}, {cs_creditor_name: "Landlord"}]},
+            "Any Aldi": {cs_rule: {cs_creditor_name: ".*aldi.*"}},
+        }
+        transactions = [
+            self._transaction("ALDI Sued", "Food and drinks"),
+            self._transaction("ALDI Sued", "Miete"),
+            self._transaction("Landlord", None),
+            self._transaction(None, "nothing"),
+            self._transaction("Big aldi", "nothing"),
+        ]
+
+        self.assertEqual(RuleMatcher(rules).match_all(transactions), ["Groceries", "Rent", "Rent", None, "Any Aldi"])
+        self.assertEqual(RuleMatcher(rules, prefilter=False).match_all(transactions),
+                         ["Groceries", "Rent", "Rent", None, "Any Aldi"])
+
+    def test_rule_cache(self):
+        rules = {
+            "Groceries": {cs_rule: {cs_creditor_name: ".*aldi.*"}},
+            "Rent": {cs_rule: {cs_message: ".*Miete.*"}},
+        }
+        transactions = [
+            self._transaction("ALDI", "x"),
+            self._transaction("aldi", "X"),
+            self._transaction("Landlord", "Miete"),
+            self._transaction("Landlord", "Miete"),
+            self._transaction("ALDI", "x"),
+        ]
+
+        cache = RuleCache(rules)
+        self.assertEqual(cache.match_all(transactions), RuleMatcher(rules).match_all(transactions))
+        self.assertEqual((cache.hits, cache.misses), (3, 2))
+
+        # Least recently used decision is evicted
+        cache = RuleCache(rules, size=1)
+        cache.match_all(transactions)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_invalid_pattern(self):
+        with self.assertRaises(ValueError):
+            RuleMatcher({"Broken": {cs_rule: {cs_message: "(unclosed"}}})
+
+
+class TestXmlUtil(unittest.TestCase):
+    def test_path_selector(self):
+        ns = {"ns": "urn:test"}
+        root = ET.fromstring(
+            '<Ntry xmlns="urn:test"><Sts><Cd>BOOK</Cd></Sts>'
+            '<Dtls><Msg>a</Msg><Msg>b</Msg></Dtls><Dtls><Msg>c</Msg><Nm>x</Nm></Dtls></Ntry>')
+        self.assertEqual(resolve_path("ns:Sts/ns:Cd", ns), "{urn:test}Sts/{urn:test}Cd")
+
+        selector = PathSelector({"status": "ns:Sts/ns:Cd", "messages": "ns:Dtls/ns:Msg", "name": "ns:Dtls/ns:Nm"},
+                                ns, optional=["name"], multiple=["messages"])
+        fields = selector.select(root)
+        self.assertEqual(fields["status"].text, "BOOK")
+        self.assertEqual([m.text for m in fields["messages"]], ["a", "b"])  # only within the first Dtls
+        self.assertIsNone(fields["name"])
+
+        with self.assertRaises(AttributeError):
+            PathSelector({"missing": "ns:Sts/ns:Nm"}, ns).select(root)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import json
+from datetime import datetime
+from wallet_keeper.modules.visualizer import processing
+from tests.unit.test_core import make_wallet
+
+
+class TestProcessing(unittest.TestCase):
+    def setUp(self):
+        processing.set_wallet(make_wallet())
+
+    def test_result_cache(self):
+        start, end = datetime(2021, 1, 1), datetime(2021, 3, 31)
+        misses = processing.results.misses
+
+        df, _, _, _ = processing.get_transfers(start_date=start, end_date=end)
+        df["name"] = "modified"
+        same, _, _, _ = processing.get_transfers(start, end)
+        self.assertEqual(processing.results.misses, misses + 1)
+        self.assertEqual(list(same["name"]), ["Groceries", "Groceries", "Salary", "Salary", "Rent", "Rent",
+                                              "Bar", "Bar"])
+
+        totals = processing.get_account_totals(start_date=start, end_date=end, hierarchy=True)
+        self.assertEqual(processing.results.misses, misses + 2)
+        self.assertEqual(len(processing.get_account_totals(start, end, True)), len(totals))
+
+        # Replacing the wallet invalidates all results
+        processing.set_wallet(make_wallet())
+        processing.get_account_totals(start_date=start, end_date=end, hierarchy=True)
+        self.assertEqual(processing.results.misses, misses + 3)
+
+    def test_frame_handle(self):
+        calls = []
+
+        @processing.frame
+        def accounts_frame(accounts, month_start):
+            calls.append(month_start)
+            df, _, _, _ = processing.get_transfers(start_date=datetime.strptime(month_start, "%m/%Y"))
+            return df[df["account"].isin(accounts)]
+
+        handle = accounts_frame.handle(["Expenses:Rent", "Income:Salary"], "02/2021")
+        self.assertEqual(json.loads(json.dumps(handle)), handle)
+        self.assertEqual(list(processing.get_frame(handle)["name"]), ["Salary", "Rent"])
+        self.assertEqual(list(processing.get_frame(handle)["name"]), ["Salary", "Rent"])
+        self.assertEqual(calls, ["02/2021"])
+        self.assertTrue(processing.get_frame(None).empty)
+
+        # A reload changes the handle, old and new handles fetch the frame of the new wallet
+        processing.set_wallet(make_wallet())
+        reloaded = accounts_frame.handle(["Expenses:Rent", "Income:Salary"], "02/2021")
+        self.assertNotEqual(reloaded, handle)
+        self.assertEqual(json.loads(json.dumps(reloaded)), reloaded)
+        self.assertEqual(list(processing.get_frame(reloaded)["name"]), ["Salary", "Rent"])
+        self.assertEqual(list(processing.get_frame(handle)["name"]), ["Salary", "Rent"])
+        self.assertEqual(len(calls), 2)
+
+    def test_monthly_panel(self):
+        dmin, dmax = datetime(2020, 12, 1), datetime(2021, 4, 30)
+        df, _, _, _ = processing.get_transfers(start_date=dmin, end_date=dmax)
+
+        panel = processing.get_monthly_panel(df, dmin, dmax, accounts=["Expenses:Food:Bars", "Income:Salary"])
+        self.assertEqual(list(panel.columns), ["date", "account", "total"])
+        self.assertEqual(len(panel), 2 * 5)
+        self.assertEqual(list(panel["total"]), [0.0, 0.0, 0.0, 21.0, 0.0, 0.0, 0.0, -2500.0, 0.0, 0.0])
+        self.assertEqual(panel["date"].iloc[0], datetime(2020, 12, 1))
+
+        panel = processing.get_monthly_panel(df, dmin, dmax)
+        self.assertEqual(len(panel), len(df["account"].unique()) * 5)
+        self.assertAlmostEqual(panel["total"].sum(), 0.0)
+
+        df, _, _, _ = processing.get_transfers(start_date=datetime(2022, 1, 1))
+        self.assertEqual(len(processing.get_monthly_panel(df, datetime(2022, 1, 1), datetime(2022, 2, 1))), 0)
+
+    def test_monthly_categories(self):
+        df = processing.get_monthly_categories(start_date=datetime(2021, 1, 1), end_date=datetime(2021, 4, 30),
+                                               cumulative=True)
+        living = df[df["category"] == "living"]
+        self.assertEqual(list(living["total"]), [31.6, 31.6, 831.6, 831.6])
+
+        df = processing.get_monthly_totals(start_date=datetime(2021, 1, 1), end_date=datetime(2021, 4, 30))
+        self.assertEqual(set(df["category"]), {"liquid", "living", "fun", "income", "insurance"})
+
+    def test_balance_history(self):
+        df = processing.get_balance_history("Expenses:Food", [datetime(2021, 2, 1), datetime(2021, 3, 5)],
+                                            children=True)
+        self.assertEqual(list(df["balance"]), [31.6, 52.6])
+        self.assertEqual(len(processing.get_balance_history("Unknown", [datetime(2021, 2, 1)])), 0)
+
+    def test_result_cache_eviction(self):
+        cache = processing.ResultCache(size=2)
+        for key in ["a", "b", "a", "c", "b"]:
+            cache.get(key, lambda: key.upper())
+
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import decimal
+import numpy
+import pandas
+from typing import Dict, List
+from wallet_keeper.modules.core.store import TransferStore
+from wallet_keeper.modules.core.hierarchy import AccountHierarchy
+from wallet_keeper.modules.core.cents import to_decimal
+
+
+class BalanceIndex(object):
+    def __init__(self, store: TransferStore, hierarchy: AccountHierarchy, value: str = "amount"):
+        """
+        Constructor
+
+        Running totals of every account and currency over its transfers sorted by date, so the balance at any date
+        is a binary search and the change between two dates the difference of two balances.
+
+        :param store: columnar transfer store
+        :param hierarchy: account hierarchy
+        :param value: ["amount", "price"] value type to sum up
+        """
+        if value not in ["amount", "price"]:
+            raise ValueError("Unknown argument value {} in BalanceIndex()".format(value))
+
+        cents = store.amount_cents if value == "amount" else store.price_cents
+        if cents is not None:
+            currency = cents.currency
+            values = cents.units
+            self.scales = cents.scales
+        else:  # values too large for fixed point, fall back to summing decimals
+            currency = store.amount_currency if value == "amount" else store.price_currency
+            values = (store.amount if value == "amount" else store.price).copy()
+            values[numpy.equal(values, None)] = decimal.Decimal(0)
+            self.scales = None
+        self.currencies = store.currencies
+
+        # Group rows by account and currency, the stable sort keeps them ordered by date within each group
+        n = len(store.currencies)
+        codes = store.account.astype(numpy.int64) * n + currency
+        order = numpy.argsort(codes, kind="stable")
+        keys, starts = numpy.unique(codes[order], return_index=True)
+        stops = numpy.append(starts[1:], len(order)).astype(numpy.int64)
+
+        self.dates = store.date[order]
+        running = numpy.cumsum(values[order])
+        if len(running):
+            before = numpy.where(starts > 0, running[numpy.maximum(starts - 1, 0)], 0)
+            self.running = running - numpy.repeat(before, stops - starts)
+        else:
+            self.running = running
+
+        # Slices of each account, one per currency
+        self._slices = {}
+        for key, start, stop in zip(keys, starts, stops):
+            account = store.accounts[key // n]
+            self._slices.setdefault(account, []).append((int(key % n), int(start), int(stop)))
+        for slices in self._slices.values():
+            slices.sort(key=lambda x: self.currencies[x[0]] or "")
+
+        # Accounts with transfers at or below each account
+        self._descendants = {}
+        for account in self._slices:
+            for ancestor in hierarchy.get_ancestors(account):
+                self._descendants.setdefault(ancestor, []).append(account)
+
+    def _decimal(self, units, code: int) -> decimal.Decimal:
+        return units if self.scales is None else to_decimal(int(units), int(self.scales[code]))
+
+    def _float(self, units: numpy.ndarray, code: int) -> numpy.ndarray:
+        if self.scales is None:
+            return units.astype(float)
+        return units / 10.0 ** int(self.scales[code])
+
+    def _units(self, start: int, stop: int, dates: numpy.ndarray, side: str = "right") -> numpy.ndarray:
+        """
+        Look up running totals of one slice
+
+        :param start: first row of the slice
+        :param stop: row after the last one
+        :param dates: datetime64 array of dates
+        :param side: "right" to include transfers on the dates, "left" to exclude them
+        :return: running totals at the dates
+        """
+        i = numpy.searchsorted(self.dates[start:stop], dates, side=side)
+        units = self.running[start + numpy.maximum(i - 1, 0)]
+        units[i == 0] = 0
+        return units
+
+    def _accounts(self, account: str, children: bool) -> List[str]:
+        if children:
+            return self._descendants.get(account, [])
+        return [account] if account in self._slices else []
+
+    def balance(self, account: str, at=None, children: bool = False) -> Dict[str, decimal.Decimal]:
+        """
+        Get the balance of an account at the end of a day
+
+        :param account: account name
+        :param at: date up to which transfers are summed up, defaults to all transfers
+        :param children: include the transfers of all sub accounts
+        :return: dictionary with a balance for every currency the account holds
+        """
+        date = numpy.array([numpy.datetime64(at if at else "9999-12-31", "us")])
+        totals = {}
+        for a in self._accounts(account, children):
+            for code, start, stop in self._slices[a]:
+                units = self._units(start, stop, date)[0]
+                totals[code] = totals[code] + units if code in totals else units
+
+        return {self.currencies[code]: self._decimal(units, code) for code, units in totals.items()}
+
+    def change(self, account: str, start_date, end_date, children: bool = False) -> Dict[str, decimal.Decimal]:
+        """
+        Sum up the transfers of an account between two days, both included
+
+        :param account: account name
+        :param start_date: first day from which transfers should be considered
+        :param end_date: last day up to which transfers should be considered
+        :param children: include the transfers of all sub accounts
+        :return: dictionary with a change for every currency the account holds
+        """
+        dates = numpy.array([numpy.datetime64(start_date, "us"), numpy.datetime64(end_date, "us")])
+        totals = {}
+        for a in self._accounts(account, children):
+            for code, start, stop in self._slices[a]:
+                units = self._units(start, stop, dates[1:])[0] - self._units(start, stop, dates[:1], side="left")[0]
+                totals[code] = totals[code] + units if code in totals else units
+
+        return {self.currencies[code]: self._decimal(units, code) for code, units in totals.items()}
+
+    def get_history(self, account: str, dates, children: bool = False) -> pandas.DataFrame:
+        """
+        Get the balances of an account at the end of several days
+
+        :param account: account name
+        :param dates: days to look up
+        :param children: include the transfers of all sub accounts
+        :return: DataFrame with date, currency and balance columns, balances as floats
+        """
+        dates = numpy.asarray(pandas.to_datetime(pandas.Series(dates)).values.astype("datetime64[us]"))
+        totals = {}
+        for a in self._accounts(account, children):
+            for code, start, stop in self._slices[a]:
+                balance = self._float(self._units(start, stop, dates), code)
+                totals[code] = totals[code] + balance if code in totals else balance
+
+        frames = [pandas.DataFrame({"date": dates, "currency": self.currencies[code], "balance": balance})
+                  for code, balance in totals.items()]
+        if not frames:
+            return pandas.DataFrame(columns=["date", "currency", "balance"])
+
+        return pandas.concat(frames, ignore_index=True)
+
+    def get_balances(self, at=None) -> pandas.DataFrame:
+        """
+        Get the balances of all accounts at the end of a day
+
+        :param at: date up to which transfers are summed up, defaults to all transfers
+        :return: DataFrame with account, currency and amount columns for accounts with transfers up to the date
+        """
+        date = numpy.array([numpy.datetime64(at if at else "9999-12-31", "us")])
+        data = []
+        for account in sorted(self._slices):
+            for code, start, stop in self._slices[account]:
+                if self.dates[start] > date[0]:
+                    continue
+                units = self._units(start, stop, date)[0]
+                data.append((account, self.currencies[code], self._decimal(units, code)))
+
+        return pandas.DataFrame(data, columns=["account", "currency", "amount"])
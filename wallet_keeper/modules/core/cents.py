@@ -0,0 +1,276 @@
+import decimal
+import numpy
+from typing import Sequence, Dict
+from wallet_keeper.modules.core.dosh import Dosh
+
+# Number of decimal places stored for each currency
+default_scale = 2
+scales = {}
+
+
+def get_scale(currency: str) -> int:
+    """
+    Get number of decimal places of a currency
+
+    :param currency: currency name
+    :return: number of decimal places
+    """
+    return scales.get(currency, default_scale)
+
+
+def set_scale(currency: str, scale: int) -> None:
+    """
+    Set number of decimal places of a currency
+
+    :param currency: currency name
+    :param scale: number of decimal places
+    """
+    scales[currency] = scale
+
+
+def to_units(value, scale: int) -> int:
+    """
+    Convert a value to an integer count of minor units
+
+    :param value: value convertible to a decimal
+    :param scale: number of decimal places
+    :return: count of minor units
+    """
+    try:
+        shifted = decimal.Decimal(value).scaleb(scale)
+    except decimal.InvalidOperation:
+        raise ValueError("Could not translate {} to a decimal format!".format(value))
+    units = int(shifted)
+    if units != shifted:
+        raise ValueError("Value {} cannot be represented with {} decimal places!".format(value, scale))
+    return units
+
+
+def fits_int64(units: numpy.ndarray) -> bool:
+    """
+    Check whether summing up minor units cannot overflow int64, whatever the grouping
+
+    :param units: int64 array with counts of minor units
+    :return: true if the sum of all magnitudes stays well within the int64 range
+    """
+    return float(numpy.abs(units.astype(float)).sum()) < 2.0 ** 62
+
+
+def sum_units(units: numpy.ndarray) -> int:
+    """
+    Sum up minor units exactly, as Python integers where int64 could overflow
+
+    :param units: int64 array with counts of minor units
+    :return: total count of minor units
+    """
+    if fits_int64(units):
+        return int(units.sum())
+    return sum(int(u) for u in units)
+
+
+def to_decimal(units: int, scale: int) -> decimal.Decimal:
+    """
+    Convert an integer count of minor units to a decimal
+
+    :param units: count of minor units
+    :param scale: number of decimal places
+    :return: decimal value
+    """
+    return decimal.Decimal(int(units)).scaleb(-scale)
+
+
+class Cents(object):
+    __slots__ = ("_units", "_currency", "_scale")
+
+    def __init__(self, value="0", currency: str = None, scale: int = None):
+        """
+        Constructor
+
+        Fixed-point alternative to Dosh storing an integer count of minor units of a currency
+
+        :param value: value convertible to a decimal
+        :param currency: currency name
+        :param scale: number of decimal places, defaults to the scale registered for the currency
+        """
+        self._scale = scale if scale is not None else get_scale(currency)
+        self._units = to_units(value, self._scale)
+        self._currency = currency
+
+    @classmethod
+    def from_units(cls, units: int, currency: str = None, scale: int = None):
+        """
+        Make an instance directly from minor units
+
+        :param units: count of minor units
+        :param currency: currency name
+        :param scale: number of decimal places, defaults to the scale registered for the currency
+        :return: new instance
+        """
+        obj = cls.__new__(cls)
+        obj._units = int(units)
+        obj._currency = currency
+        obj._scale = scale if scale is not None else get_scale(currency)
+        return obj
+
+    @classmethod
+    def from_dosh(cls, dosh: Dosh, scale: int = None):
+        """
+        Convert from Dosh
+
+        :param dosh: amount to convert
+        :param scale: number of decimal places, defaults to the scale registered for the currency
+        :return: new instance
+        """
+        return cls(dosh.value, dosh.currency, scale)
+
+    def to_dosh(self) -> Dosh:
+        """
+        Convert to Dosh
+
+        :return: Dosh instance
+        """
+        return Dosh(self.value, self._currency)
+
+    @property
+    def units(self) -> int:
+        return self._units
+
+    @property
+    def value(self) -> decimal.Decimal:
+        return to_decimal(self._units, self._scale)
+
+    @property
+    def currency(self) -> str:
+        return self._currency
+
+    @property
+    def scale(self) -> int:
+        return self._scale
+
+    def _aligned(self, other, operation: str) -> (int, int, int):
+        """
+        Bring two instances to a common scale
+
+        :param other: other instance
+        :param operation: name of the operation for error messages
+        :return: common scale and units of both instances
+        """
+        if not isinstance(other, Cents):
+            raise ValueError("Cannot {} classes {} and {}".format(operation, type(self), type(other)))
+        if other.currency != self._currency:
+            raise ValueError(
+                "Cannot {} two different currencies {} and {}".format(operation, self._currency, other.currency))
+
+        scale = max(self._scale, other.scale)
+        return (scale, self._units * 10 ** (scale - self._scale),
+                other.units * 10 ** (scale - other.scale))
+
+    def __hash__(self):
+        return hash((self.value, self._currency))
+
+    def __repr__(self):
+        return "{} {}".format(self.value, self._currency)
+
+    def __neg__(self):
+        return self.from_units(-self._units, self._currency, self._scale)
+
+    def __add__(self, other):
+        scale, a, b = self._aligned(other, "add")
+        return self.from_units(a + b, self._currency, scale)
+
+    def __sub__(self, other):
+        scale, a, b = self._aligned(other, "subtract")
+        return self.from_units(a - b, self._currency, scale)
+
+    def __eq__(self, other):
+        if isinstance(other, Cents):
+            return self.value == other.value and self._currency == other.currency
+        else:
+            raise ValueError(
+                "Cannot compare classes {} and {}".format(type(self), type(other)))
+
+
+class CentsArray(object):
+    def __init__(self, units: numpy.ndarray, currency: numpy.ndarray, currencies: numpy.ndarray,
+                 currency_scales: numpy.ndarray):
+        """
+        Constructor
+
+        Column of amounts kept as int64 minor units, so sums run on native integers instead of
+        object-dtype decimals.
+
+        :param units: int64 array with counts of minor units
+        :param currency: array with currency codes for every entry
+        :param currencies: array with currency names indexed by the codes
+        :param currency_scales: array with the number of decimal places indexed by the codes
+        """
+        self.units = units
+        self.currency = currency
+        self.currencies = currencies
+        self.scales = currency_scales
+
+    @classmethod
+    def from_values(cls, values: Sequence, currency: numpy.ndarray, currencies: numpy.ndarray):
+        """
+        Build an array from decimal values
+
+        The scale of each currency is the registered one, raised if needed to hold every value exactly.
+
+        :param values: decimal values (None is stored as zero)
+        :param currency: array with currency codes for every value
+        :param currencies: array with currency names indexed by the codes
+        :return: new instance
+        """
+        currency_scales = numpy.array([get_scale(c) for c in currencies], dtype=numpy.int64)
+        for v, c in zip(values, currency):
+            if v is not None:
+                exponent = v.as_tuple().exponent
+                if isinstance(exponent, int) and -exponent > currency_scales[c]:
+                    currency_scales[c] = -exponent
+
+        # Raises OverflowError for values that do not fit into int64 minor units
+        units = numpy.fromiter(
+            (to_units(v, int(currency_scales[c])) if v is not None else 0 for v, c in zip(values, currency)),
+            dtype=numpy.int64, count=len(values))
+
+        return cls(units, numpy.asarray(currency), currencies, currency_scales)
+
+    def __len__(self):
+        return len(self.units)
+
+    def __getitem__(self, item):
+        return CentsArray(self.units[item], self.currency[item], self.currencies, self.scales)
+
+    def to_decimal(self, units: int, code: int) -> decimal.Decimal:
+        """
+        Convert minor units of one of the currencies to a decimal
+
+        :param units: count of minor units
+        :param code: currency code
+        :return: decimal value
+        """
+        return to_decimal(units, int(self.scales[code]))
+
+    def get_decimals(self) -> numpy.ndarray:
+        """
+        Get all values as decimals
+
+        :return: object array with decimals
+        """
+        values = numpy.empty(len(self.units), dtype=object)
+        values[:] = [self.to_decimal(u, c) for u, c in zip(self.units, self.currency)]
+        return values
+
+    def sum(self) -> Dict[str, Cents]:
+        """
+        Sum up values of each currency
+
+        :return: dictionary with a total for every currency present
+        """
+        counts = numpy.bincount(self.currency, minlength=len(self.currencies))
+        result = {}
+        for code in numpy.nonzero(counts)[0]:
+            mask = self.currency == code
+            result[self.currencies[code]] = Cents.from_units(
+                sum_units(self.units[mask]), self.currencies[code], int(self.scales[code]))
+        return result
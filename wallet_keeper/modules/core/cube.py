@@ -0,0 +1,228 @@
+import decimal
+import numpy
+import pandas
+from typing import List
+from wallet_keeper.modules.core.store import TransferStore
+from wallet_keeper.modules.core.hierarchy import AccountHierarchy
+from wallet_keeper.modules.core.cents import to_decimal
+
+
+class CubeTable(object):
+    def __init__(self, accounts: List[str], currency: numpy.ndarray, sums: numpy.ndarray, counts: numpy.ndarray,
+                 hierarchy: AccountHierarchy):
+        """
+        Constructor
+
+        Rows of the cube with prefix sums over the months, column j holds the sums of all months before month j.
+
+        :param accounts: account of each row
+        :param currency: currency code of each row
+        :param sums: monthly sums with one row per account and currency
+        :param counts: monthly transfer counts of the same shape
+        :param hierarchy: account hierarchy
+        """
+        self.accounts = numpy.empty(len(accounts), dtype=object)
+        self.accounts[:] = accounts
+        self.currency = currency
+        self.depth = numpy.array([hierarchy.get_depth(a) for a in accounts], dtype=numpy.int64)
+        self.parent = numpy.empty(len(accounts), dtype=object)
+        self.parent[:] = [hierarchy.get_parent(a) for a in accounts]
+
+        self.sums = numpy.zeros((sums.shape[0], sums.shape[1] + 1), dtype=sums.dtype)
+        self.sums[:, 0] = 0
+        self.sums[:, 1:] = numpy.cumsum(sums, axis=1)
+        self.counts = numpy.zeros((counts.shape[0], counts.shape[1] + 1), dtype=numpy.int64)
+        self.counts[:, 1:] = numpy.cumsum(counts, axis=1)
+
+    def active(self, c0: int, c1: int) -> numpy.ndarray:
+        """
+        Find rows with transfers between two prefix sum columns
+
+        :param c0: first column
+        :param c1: last column
+        :return: row indices
+        """
+        return numpy.nonzero(self.counts[:, c1] - self.counts[:, c0] > 0)[0]
+
+
+class MonthlyCube(object):
+    def __init__(self, store: TransferStore, hierarchy: AccountHierarchy):
+        """
+        Constructor
+
+        Sums of transfer prices per account, currency and calendar month, once for the accounts themselves and once
+        rolled up to all parent accounts, kept as prefix sums over the months. Any month range is answered by
+        subtracting two columns, so queries take time proportional to accounts times months, independent of the
+        number of transfers.
+
+        :param store: columnar transfer store
+        :param hierarchy: account hierarchy
+        """
+        cents = store.price_cents
+        if store.size:
+            self.first = store.date[0].astype("datetime64[M]")
+            month = (store.date.astype("datetime64[M]") - self.first).astype(numpy.int64)
+            self.n_months = int(month[-1]) + 1
+        else:
+            self.first = numpy.datetime64("1970-01", "M")
+            month = numpy.zeros(0, dtype=numpy.int64)
+            self.n_months = 0
+
+        if cents is not None:
+            currency = cents.currency
+            values = cents.units
+            self.scales = cents.scales
+        else:  # values too large for fixed point, fall back to summing decimals
+            currency = store.price_currency
+            values = store.price.copy()
+            values[numpy.equal(values, None)] = decimal.Decimal(0)
+            self.scales = None
+        self.currencies = store.currencies
+
+        # Rows of the accounts themselves, one per account and currency present
+        n = len(store.currencies)
+        codes, row = numpy.unique(store.account.astype(numpy.int64) * n + currency, return_inverse=True)
+        accounts = store.accounts[codes // n]
+        currencies = codes % n
+        order = sorted(range(len(codes)), key=lambda i: (accounts[i], self.currencies[currencies[i]] or ""))
+        rank = numpy.empty(len(codes), dtype=numpy.int64)
+        rank[order] = numpy.arange(len(codes))
+        row = rank[row]
+        accounts = [accounts[i] for i in order]
+        currencies = currencies[order]
+
+        sums = numpy.zeros((len(codes), self.n_months), dtype=values.dtype)
+        sums[:] = 0
+        numpy.add.at(sums, (row, month), values)
+        counts = numpy.zeros((len(codes), self.n_months), dtype=numpy.int64)
+        numpy.add.at(counts, (row, month), 1)
+        self.own = CubeTable(accounts, currencies, sums, counts, hierarchy)
+
+        # Rows of the accounts and all their parents
+        keys = sorted({(a, int(c)) for account, c in zip(accounts, currencies) for a in hierarchy.get_ancestors(account)},
+                      key=lambda x: (x[0], self.currencies[x[1]] or ""))
+        index = {key: i for i, key in enumerate(keys)}
+        src = []
+        dst = []
+        for i, (account, c) in enumerate(zip(accounts, currencies)):
+            for a in hierarchy.get_ancestors(account):
+                src.append(i)
+                dst.append(index[(a, int(c))])
+        src = numpy.array(src, dtype=numpy.int64)
+        dst = numpy.array(dst, dtype=numpy.int64)
+
+        rolled_sums = numpy.zeros((len(keys), self.n_months), dtype=values.dtype)
+        rolled_sums[:] = 0
+        numpy.add.at(rolled_sums, dst, sums[src])
+        rolled_counts = numpy.zeros((len(keys), self.n_months), dtype=numpy.int64)
+        numpy.add.at(rolled_counts, dst, counts[src])
+        self.rolled = CubeTable([a for a, _ in keys], numpy.array([c for _, c in keys], dtype=numpy.int64),
+                                rolled_sums, rolled_counts, hierarchy)
+
+    def _months(self, start_date=None, end_date=None) -> numpy.ndarray:
+        """
+        Get the months of a date range
+
+        :param start_date: day within the first month, defaults to the first month with transfers
+        :param end_date: day within the last month, defaults to the last month with transfers
+        :return: array with the months
+        """
+        m0 = numpy.datetime64(start_date, "M") if start_date else self.first
+        m1 = numpy.datetime64(end_date, "M") if end_date else self.first + max(self.n_months - 1, 0)
+        return numpy.arange(m0, m1 + 1, dtype="datetime64[M]")
+
+    def _column(self, months: numpy.ndarray) -> numpy.ndarray:
+        """
+        Map months to prefix sum columns, months outside of the data are clipped
+
+        :param months: array with months
+        :return: index of the column holding the sums of all months before each month
+        """
+        return numpy.clip((months - self.first).astype(numpy.int64), 0, self.n_months)
+
+    def _to_float(self, units: numpy.ndarray, currency: numpy.ndarray) -> numpy.ndarray:
+        """
+        Convert sums to floats
+
+        :param units: array with one row per currency code
+        :param currency: currency code of each row
+        :return: float array of the same shape
+        """
+        if self.scales is None:
+            return units.astype(float)
+        return units / numpy.power(10.0, self.scales[currency])[:, None]
+
+    def get_totals(self, start_date=None, end_date=None, hierarchy: bool = True) -> pandas.DataFrame:
+        """
+        Sum up account totals over whole months
+
+        :param start_date: day within the first month
+        :param end_date: day within the last month
+        :param hierarchy: include parent accounts
+        :return: DataFrame with account, currency, amount, depth and parent columns, amounts as decimals
+        """
+        table = self.rolled if hierarchy else self.own
+        months = self._months(start_date, end_date)
+        c0, c1 = (int(self._column(months[0])), int(self._column(months[-1] + 1))) if len(months) else (0, 0)
+        rows = table.active(c0, c1)
+        sums = table.sums[rows, c1] - table.sums[rows, c0]
+
+        amounts = numpy.empty(len(rows), dtype=object)
+        if self.scales is None:
+            amounts[:] = list(sums)
+        else:
+            amounts[:] = [to_decimal(int(u), int(self.scales[c])) for u, c in zip(sums, table.currency[rows])]
+
+        return pandas.DataFrame({
+            "account": table.accounts[rows],
+            "currency": self.currencies[table.currency[rows]],
+            "amount": amounts,
+            "depth": table.depth[rows],
+            "parent": table.parent[rows],
+        })
+
+    def get_monthly(self, start_date=None, end_date=None, hierarchy: bool = False,
+                    cumulative: bool = False) -> pandas.DataFrame:
+        """
+        Get totals of every month for all accounts with transfers in the range
+
+        :param start_date: day within the first month
+        :param end_date: day within the last month
+        :param hierarchy: include parent accounts
+        :param cumulative: running totals since the start of the range instead of monthly totals
+        :return: DataFrame with date, account, currency and total columns on the full grid of accounts and months,
+            totals as floats
+        """
+        table = self.rolled if hierarchy else self.own
+        months = self._months(start_date, end_date)
+        first = self._column(months)
+        last = self._column(months + 1)
+        rows = table.active(first[0], last[-1]) if len(months) else numpy.zeros(0, dtype=numpy.int64)
+
+        sums = table.sums[rows]
+        units = sums[:, last] - (sums[:, first[:1]] if cumulative else sums[:, first])
+        totals = self._to_float(units, table.currency[rows])
+
+        return pandas.DataFrame({
+            "date": numpy.tile(months.astype("datetime64[ns]"), len(rows)),
+            "account": numpy.repeat(table.accounts[rows], len(months)),
+            "currency": numpy.repeat(self.currencies[table.currency[rows]], len(months)),
+            "total": totals.ravel(),
+        })
+
+    def get_monthly_by(self, labels: dict, start_date=None, end_date=None,
+                       cumulative: bool = False) -> pandas.DataFrame:
+        """
+        Get totals of every month per label of the accounts, e.g. per category
+
+        :param labels: label of each account, accounts without a label are skipped
+        :param start_date: day within the first month
+        :param end_date: day within the last month
+        :param cumulative: running totals since the start of the range instead of monthly totals
+        :return: DataFrame with date, label, currency and total columns
+        """
+        df = self.get_monthly(start_date, end_date, hierarchy=False, cumulative=cumulative)
+        df["label"] = df["account"].map(labels)
+        df = df[df["label"].notnull()]
+
+        return df.groupby(["date", "label", "currency"])["total"].sum().reset_index()
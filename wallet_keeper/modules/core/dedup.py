@@ -0,0 +1,96 @@
+from collections import Counter
+from typing import Iterable, List
+from wallet_keeper.modules.core.transaction import Transaction
+from wallet_keeper.utils.collection import *
+import hashlib
+
+
+def _hash(text: str) -> str:
+    """
+    Hash a free text field, so long messages do not bloat the fingerprint
+
+    :param text: text or None
+    :return: hex digest
+    """
+    return hashlib.blake2b((text or "").encode(), digest_size=8).hexdigest()
+
+
+def _money(dosh) -> tuple:
+    """
+    Key of an amount or price
+
+    :param dosh: amount or None
+    :return: value and currency, None without an amount
+    """
+    return (dosh.value, dosh.currency) if dosh is not None else None
+
+
+def fingerprint(trans: Transaction) -> tuple:
+    """
+    Identify a transaction by its content, independently of the statement it has been read from
+
+    Bank statement entries are identified by value date, amount, currency, own account, counterparty IBANs and a hash
+    of the message. Other transactions fall back to their dates, name and transfers.
+
+    :param trans: transaction
+    :return: hashable fingerprint
+    """
+    p = trans.properties
+    if cs_valdate in p and cs_amount in p:
+        return (p[cs_valdate], p[cs_amount], p.get(cs_currency), p.get(cs_account),
+                p.get(cs_creditor_account), p.get(cs_debtor_account), _hash(p.get(cs_message)))
+
+    return (trans.trans_date, trans.book_date, trans.name,
+            tuple((t.account, _money(t.amount), _money(t.price)) for t in trans.transfers))
+
+
+class FingerprintIndex(object):
+    """
+    Multiset of transaction fingerprints
+
+    A fingerprint occurring several times within one statement (e.g. two identical card payments on the same day) is
+    counted as such, so merging an overlapping statement only drops the copies beyond the largest count seen so far.
+    """
+
+    def __init__(self, transactions: Iterable[Transaction] = ()):
+        """
+        Constructor
+
+        :param transactions: transactions to index
+        """
+        self._counts = Counter()
+        for trans in transactions:
+            self._counts[fingerprint(trans)] += 1
+
+    def __len__(self) -> int:
+        return sum(self._counts.values())
+
+    def count(self, trans: Transaction) -> int:
+        """
+        Get the number of indexed transactions with the same fingerprint
+
+        :param trans: transaction
+        :return: number of occurrences
+        """
+        return self._counts[fingerprint(trans)]
+
+    def merge(self, transactions: Iterable[Transaction]) -> (List[Transaction], List[Transaction]):
+        """
+        Add a batch of transactions, e.g. a statement, skipping those already indexed
+
+        :param transactions: transactions to add
+        :return: lists of new and of skipped transactions
+        """
+        new = []
+        skipped = []
+        seen = Counter()
+        for trans in transactions:
+            key = fingerprint(trans)
+            seen[key] += 1
+            if seen[key] > self._counts[key]:
+                self._counts[key] = seen[key]
+                new.append(trans)
+            else:
+                skipped.append(trans)
+
+        return new, skipped
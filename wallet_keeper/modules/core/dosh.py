@@ -1,13 +1,30 @@
 import decimal
+import sys
 
 
 class Dosh(object):
+    __slots__ = ("_value", "_currency")
+
     def __init__(self, value: str = "0.0", currency: str = None):
         try:
             self._value = decimal.Decimal(value)
         except decimal.InvalidOperation:
             raise ValueError("Could not translate {} to a decimal format!".format(value))
-        self._currency = currency
+        self._currency = sys.intern(currency) if currency else currency
+
+    @classmethod
+    def _make(cls, value: decimal.Decimal, currency: str):
+        """
+        Make an instance from an already computed decimal without parsing it again
+
+        :param value: decimal value
+        :param currency: currency name
+        :return: new instance
+        """
+        obj = cls.__new__(cls)
+        obj._value = value
+        obj._currency = currency
+        return obj
 
     @property
     def value(self):
@@ -31,24 +48,24 @@ class Dosh(object):
             if other.currency != self._currency:
                 raise ValueError(
                     "Cannot add two different currencies {} and {}".format(self.currency, other.currency))
-        return self.__class__(str(self.value + other.value), self._currency)
+        return self._make(self.value + other.value, self._currency)
 
     def __sub__(self, other):
         if isinstance(other, Dosh):
             if other.currency != self._currency:
                 raise ValueError(
                     "Cannot subtract two different currencies {} and {}".format(self.currency, other.currency))
-        return self.__class__(str(self.value - other.value), self._currency)
+        return self._make(self.value - other.value, self._currency)
 
     def __mul__(self, other):
         if isinstance(other, Dosh):
-            return self.__class__(str(self.value * other.value), self._currency)
+            return self._make(self.value * other.value, self._currency)
         elif isinstance(other, int):
-            return self.__class__(str(self.value * other), self._currency)
+            return self._make(self.value * other, self._currency)
         elif isinstance(other, decimal.Decimal):
-            return self.__class__(str(self.value * other), self._currency)
+            return self._make(self.value * other, self._currency)
         elif isinstance(other, float):
-            return self.__class__(str(self.value * decimal.Decimal(other)), self._currency)
+            return self._make(self.value * decimal.Decimal(other), self._currency)
         else:
             if other.currency != self._currency:
                 raise ValueError(
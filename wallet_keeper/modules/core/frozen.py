@@ -0,0 +1,26 @@
+class FrozenDict(dict):
+    """
+    Dictionary that cannot be modified, used to share empty containers between instances
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("{} cannot be modified".format(type(self).__name__))
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    __ior__ = _immutable
+    clear = _immutable
+    pop = _immutable
+    popitem = _immutable
+    setdefault = _immutable
+    update = _immutable
+
+    def __reduce__(self):
+        if not self:
+            return "EMPTY_DICT"  # keep the shared instance when unpickled, e.g. from a worker process
+        return FrozenDict, (dict(self),)
+
+
+# Shared empty containers
+EMPTY_LIST = ()
+EMPTY_DICT = FrozenDict()
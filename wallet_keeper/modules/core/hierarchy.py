@@ -0,0 +1,107 @@
+import pandas
+from typing import Iterable, List
+
+
+class AccountHierarchy(object):
+    def __init__(self, accounts: Iterable[str] = (), delim: str = ":"):
+        """
+        Constructor
+
+        Precomputes the chain of ancestors of every account once, so that totals can be rolled up to
+        parent accounts with a single explode and groupby.
+
+        :param accounts: account names
+        :param delim: delimiter separating account levels
+        """
+        self.delim = delim
+        self._ancestors = {}
+        for account in accounts:
+            self.get_ancestors(account)
+
+    def get_ancestors(self, account: str) -> List[str]:
+        """
+        Get an account followed by all of its parents up to the root
+
+        :param account: account name
+        :return: list of account names
+        """
+        ancestors = self._ancestors.get(account)
+        if ancestors is None:
+            splits = account.split(self.delim)
+            ancestors = [self.delim.join(splits[:i]) for i in range(len(splits), 0, -1)]
+            self._ancestors[account] = ancestors
+        return ancestors
+
+    def get_parent(self, account: str) -> str:
+        """
+        Get the parent of an account
+
+        :param account: account name
+        :return: parent name or an empty string for top level accounts
+        """
+        ancestors = self.get_ancestors(account)
+        return ancestors[1] if len(ancestors) > 1 else ""
+
+    def get_depth(self, account: str) -> int:
+        """
+        Get the depth of an account in the hierarchy
+
+        :param account: account name
+        :return: 0 for top level accounts
+        """
+        return len(self.get_ancestors(account)) - 1
+
+    def _map(self, accounts: pandas.Series, func) -> pandas.Series:
+        lookup = {a: func(a) for a in accounts.unique()}
+        return accounts.map(lookup)
+
+    def explode(self, df: pandas.DataFrame, column: str = "account") -> pandas.DataFrame:
+        """
+        Repeat every row for the account itself and each of its ancestors
+
+        :param df: DataFrame with an account column
+        :param column: name of the account column
+        :return: DataFrame in which the account column holds the ancestors
+        """
+        df = df.copy()
+        df[column] = self._map(df[column], self.get_ancestors)
+        return df.explode(column, ignore_index=True)
+
+    def roll_up(self, df: pandas.DataFrame, by: List[str] = None, values: List[str] = None) -> pandas.DataFrame:
+        """
+        Sum up values of accounts including all of their parents
+
+        :param df: DataFrame with an account column
+        :param by: additional columns to group by
+        :param values: columns to sum up
+        :return: DataFrame with totals for each account, its depth and its parent
+        """
+        by = by if by is not None else ["currency"]
+        values = values if values is not None else ["amount"]
+
+        # Reduce to one row per account before exploding
+        df = df.groupby(["account", *by])[values].sum().reset_index()
+        df = self.explode(df)
+        df = df.groupby(["account", *by])[values].sum().reset_index()
+
+        df["depth"] = self._map(df["account"], self.get_depth).astype(int)
+        df["parent"] = self._map(df["account"], self.get_parent)
+
+        return df
+
+    def sum_leaves(self, df: pandas.DataFrame, value: str = "amount") -> pandas.Series:
+        """
+        Sum up values of the leaf rows below each row, e.g. for "total" branch values of sunburst charts
+
+        :param df: DataFrame with an account column including the parent accounts
+        :param value: column to sum up
+        :return: series aligned with the DataFrame; leaf rows keep their own value
+        """
+        parents = set()
+        for account in df["account"].unique():
+            parents.update(self.get_ancestors(account)[1:])
+
+        leaves = df.loc[~df["account"].isin(parents), ["account", value]]
+        totals = self.explode(leaves).groupby("account")[value].sum()
+
+        return df["account"].map(totals)
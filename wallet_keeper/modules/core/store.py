@@ -0,0 +1,290 @@
+import numpy
+import pandas
+from typing import List, Dict
+from wallet_keeper.modules.core.transaction import Transaction
+from wallet_keeper.modules.core.cents import CentsArray, fits_int64
+
+
+class SparseColumn(object):
+    def __init__(self):
+        """
+        Constructor
+
+        Column that stores only set entries as pairs of row numbers and values
+        """
+        self._rows = []
+        self._values = []
+        self.rows = None
+        self.values = None
+
+    def append(self, row: int, value) -> None:
+        """
+        Add an entry while the column is being built
+
+        :param row: row number (must not decrease between calls)
+        :param value: value to store
+        """
+        if self._rows and self._rows[-1] == row:
+            self._values[-1] = value  # later definitions override earlier ones
+        else:
+            self._rows.append(row)
+            self._values.append(value)
+
+    def freeze(self) -> None:
+        """
+        Convert collected entries to NumPy arrays
+        """
+        self.rows = numpy.array(self._rows, dtype=numpy.int64)
+        self.values = numpy.empty(len(self._values), dtype=object)
+        self.values[:] = self._values
+        self._rows = []
+        self._values = []
+
+    def take(self, start: int, stop: int, fill=numpy.nan) -> (int, numpy.ndarray):
+        """
+        Materialize a dense slice of the column
+
+        :param start: first row
+        :param stop: row after the last one
+        :param fill: value to use for rows without an entry
+        :return: first row with an entry (or -1 if there is none) and the dense values
+        """
+        i0, i1 = numpy.searchsorted(self.rows, [start, stop])
+        if i0 == i1:
+            return -1, None
+
+        column = numpy.full(stop - start, fill, dtype=object)
+        column[self.rows[i0:i1] - start] = self.values[i0:i1]
+
+        return int(self.rows[i0]), column
+
+
+class TransferStore(object):
+    def __init__(self, transactions: List[Transaction], account_labels: Dict[str, str] = None):
+        """
+        Constructor
+
+        Columnar copy of all transfers ordered by the transaction date, so that date ranges map onto
+        contiguous row slices.
+
+        :param transactions: list of transactions sorted by date
+        :param account_labels: dictionary with account categories
+        """
+        labels = account_labels if account_labels else {}
+
+        account_codes = {}
+        currency_codes = {None: 0}
+        accounts = []
+        dates = []
+        booking_dates = []
+        names = []
+        amounts = []
+        amount_currencies = []
+        prices = []
+        price_currencies = []
+
+        self.tags = {}
+        self.properties = {}
+        self.comments_transaction = SparseColumn()
+        self.comments_transfer = SparseColumn()
+
+        row = 0
+        for t in transactions:
+            t_comment = "\n".join(t.comments)
+            for tt in t.transfers:
+                accounts.append(account_codes.setdefault(tt.account, len(account_codes)))
+                dates.append(self._sort_date(t))
+                booking_dates.append(t.book_date)
+                names.append(t.name)
+
+                for value, values, currencies in ((tt.amount, amounts, amount_currencies),
+                                                  (tt.price, prices, price_currencies)):
+                    if value is None:
+                        values.append(None)
+                        currencies.append(0)
+                    else:
+                        values.append(value.value)
+                        currencies.append(currency_codes.setdefault(value.currency, len(currency_codes)))
+
+                for label in t.labels:
+                    self.tags.setdefault(label, SparseColumn()).append(row, True)
+                for label in tt.labels:
+                    self.tags.setdefault(label, SparseColumn()).append(row, True)
+
+                for key, value in t.properties.items():
+                    self.properties.setdefault(key, SparseColumn()).append(row, value)
+                for key, value in tt.properties.items():
+                    self.properties.setdefault(key, SparseColumn()).append(row, value)
+
+                if t_comment:
+                    self.comments_transaction.append(row, t_comment)
+                if tt.comments:
+                    self.comments_transfer.append(row, "\n".join(tt.comments))
+
+                row += 1
+
+        self.size = row
+
+        # Lookup tables
+        self.accounts = numpy.empty(len(account_codes), dtype=object)
+        self.accounts[:] = list(account_codes.keys())
+        self.categories = numpy.empty(len(account_codes), dtype=object)
+        self.categories[:] = [labels.get(a) for a in account_codes.keys()]
+        self.currencies = numpy.empty(len(currency_codes), dtype=object)
+        self.currencies[:] = list(currency_codes.keys())
+
+        # Columns
+        self.account = numpy.array(accounts, dtype=numpy.int32)
+        self.date = numpy.array(dates, dtype="datetime64[us]")
+        self.booking_date = numpy.array(booking_dates, dtype="datetime64[us]")
+        self.name = self._object_array(names)
+        self.amount = self._object_array(amounts)
+        self.amount_currency = numpy.array(amount_currencies, dtype=numpy.int32)
+        self.price = self._object_array(prices)
+        self.price_currency = numpy.array(price_currencies, dtype=numpy.int32)
+
+        # Fixed-point copies of the values for native integer aggregation
+        self.amount_cents = self._cents_array(self.amount, self.amount_currency)
+        self.price_cents = self._cents_array(self.price, self.price_currency)
+
+        for column in [*self.tags.values(), *self.properties.values(),
+                       self.comments_transaction, self.comments_transfer]:
+            column.freeze()
+
+    @staticmethod
+    def _sort_date(trans: Transaction):
+        return trans.trans_date if trans.trans_date else trans.book_date
+
+    def _cents_array(self, values: numpy.ndarray, currency: numpy.ndarray) -> CentsArray:
+        """
+        Make a fixed-point copy of a value column
+
+        :param values: object array with decimals
+        :param currency: array with currency codes
+        :return: fixed-point array or None if the values do not fit into int64 minor units
+        """
+        try:
+            return CentsArray.from_values(values, currency, self.currencies)
+        except OverflowError:
+            return None
+
+    @staticmethod
+    def _object_array(values: list) -> numpy.ndarray:
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+
+    def get_range(self, start_date=None, end_date=None) -> (int, int):
+        """
+        Find rows within a date range
+
+        :param start_date: first day from which transfers should be considered
+        :param end_date: last day up to which transfers should be considered
+        :return: first row and the row after the last one
+        """
+        start = 0
+        stop = self.size
+        if start_date:
+            start = int(numpy.searchsorted(self.date, numpy.datetime64(start_date, "us"), side="left"))
+        if end_date:
+            stop = int(numpy.searchsorted(self.date, numpy.datetime64(end_date, "us"), side="right"))
+
+        return start, max(start, stop)
+
+    @staticmethod
+    def _sparse_frame(columns: Dict[str, SparseColumn], start: int, stop: int) -> pandas.DataFrame:
+        """
+        Materialize sparse columns into a DataFrame
+
+        :param columns: dictionary with sparse columns
+        :param start: first row
+        :param stop: row after the last one
+        :return: DataFrame ordered by the first appearance of each column
+        """
+        data = []
+        for key, column in columns.items():
+            first, values = column.take(start, stop)
+            if values is not None:
+                data.append((first, key, values))
+        data.sort(key=lambda x: x[0])
+
+        return pandas.DataFrame({key: values for _, key, values in data}, index=pandas.RangeIndex(stop - start))
+
+    def get_pandas_transfers(self, start_date=None, end_date=None):
+        """
+        Get DataFrame of transfers
+
+        :param start_date: first day from which transfers should be considered
+        :param end_date: last day up to which transfers should be considered
+        :return: DataFrames with transfers, tags, properties and comments
+        """
+        start, stop = self.get_range(start_date, end_date)
+        rows = slice(start, stop)
+        account = self.account[rows]
+
+        df = pandas.DataFrame({
+            "account": self.accounts[account],
+            "category": self.categories[account],
+            "date": self.date[rows],
+            "booking_date": self.booking_date[rows],
+            "name": self.name[rows],
+            "amount": self.amount[rows],
+            "amount_currency": self.currencies[self.amount_currency[rows]],
+            "price": self.price[rows],
+            "price_currency": self.currencies[self.price_currency[rows]],
+        })
+        df_tags = self._sparse_frame(self.tags, start, stop)
+        df_properties = self._sparse_frame(self.properties, start, stop)
+
+        if stop > start:
+            _, transaction = self.comments_transaction.take(start, stop, fill="")
+            _, transfer = self.comments_transfer.take(start, stop, fill="")
+            df_comments = pandas.DataFrame({
+                0: transaction if transaction is not None else "",
+                1: "\n",
+                2: transfer if transfer is not None else ""
+            }, index=pandas.RangeIndex(stop - start))
+        else:
+            df_comments = pandas.DataFrame()
+
+        return df, df_tags, df_properties, df_comments
+
+    def get_pandas_totals(self, value: str = "amount", start_date=None, end_date=None) -> pandas.DataFrame:
+        """
+        Sum up account totals
+
+        :param value: ["amount", "price"] value type to sum up
+        :param start_date: first day from which transfers should be considered
+        :param end_date: last day up to which transfers should be considered
+        :return: DataFrame with totals for each account and currency
+        """
+        start, stop = self.get_range(start_date, end_date)
+        cents = self.amount_cents if value == "amount" else self.price_cents
+        if cents is None:
+            df = pandas.DataFrame({
+                "account": self.accounts[self.account[start:stop]],
+                "amount": (self.amount if value == "amount" else self.price)[start:stop],
+                "currency": self.currencies[(self.amount_currency if value == "amount" else
+                                             self.price_currency)[start:stop]],
+            })
+            return df.groupby(["account", "currency"])["amount"].sum().reset_index()
+
+        # Transfers without a currency are dropped, like the missing group keys of the decimal path
+        cents = cents[start:stop]
+        df = pandas.DataFrame({
+            "account": self.account[start:stop],
+            "currency": cents.currency,
+            "units": cents.units if fits_int64(cents.units) else cents.units.astype(object)
+        })
+        df = df[df["currency"] != 0]
+        df = df.groupby(["account", "currency"])["units"].sum().reset_index()
+
+        amounts = numpy.empty(len(df), dtype=object)
+        amounts[:] = [cents.to_decimal(u, c) for u, c in zip(df["units"], df["currency"])]
+        df = pandas.DataFrame({
+            "account": self.accounts[df["account"].values],
+            "currency": self.currencies[df["currency"].values],
+            "amount": amounts
+        })
+
+        return df.sort_values(["account", "currency"]).reset_index(drop=True)
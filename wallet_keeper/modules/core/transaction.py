@@ -2,10 +2,13 @@ from datetime import datetime
 from typing import Dict, List
 from wallet_keeper.modules.core.dosh import Dosh
 from wallet_keeper.modules.core.transfer import Transfer
+from wallet_keeper.modules.core.frozen import EMPTY_LIST, EMPTY_DICT
 import numpy
 
 
 class Transaction(object):
+    __slots__ = ("trans_date", "book_date", "name", "labels", "properties", "comments", "transfers")
+
     def __init__(self, trans_date: datetime, book_date: datetime, name: str,
                  labels: List[str], properties: Dict[str, str], comments: List[str],
                  transfers: List[Transfer], raw=False):
@@ -23,9 +26,9 @@ class Transaction(object):
         self.trans_date = trans_date if trans_date else book_date
         self.book_date = book_date
         self.name = name
-        self.labels = labels
-        self.properties = properties
-        self.comments = comments
+        self.labels = labels if labels else EMPTY_LIST
+        self.properties = properties if properties else EMPTY_DICT
+        self.comments = comments if comments else EMPTY_LIST
         self.transfers = transfers
 
         if not raw:
@@ -1,8 +1,12 @@
 from typing import List, Dict
 from wallet_keeper.modules.core.dosh import Dosh
+from wallet_keeper.modules.core.frozen import EMPTY_LIST, EMPTY_DICT
+import sys
 
 
 class Transfer(object):
+    __slots__ = ("account", "amount", "price", "labels", "properties", "comments")
+
     def __init__(self, account: str, amount: Dosh = None, price: Dosh = None,
                  labels: List[str] = None, properties: Dict[str, str] = None, comments: List[str] = None):
         """
@@ -15,9 +19,9 @@ class Transfer(object):
         :param properties: dictionary with tags and values
         :param comments: list of comments
         """
-        self.account = account
+        self.account = sys.intern(account) if account else account
         self.amount = amount
         self.price = price
-        self.labels = labels if labels else []
-        self.properties = properties if properties else {}
-        self.comments = comments if comments else []
+        self.labels = labels if labels else EMPTY_LIST
+        self.properties = properties if properties else EMPTY_DICT
+        self.comments = comments if comments else EMPTY_LIST
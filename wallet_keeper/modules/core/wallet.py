@@ -1,7 +1,13 @@
 import pandas
 from typing import List, Dict
 from wallet_keeper.modules.core.transaction import Transaction
+from wallet_keeper.modules.core.store import TransferStore
+from wallet_keeper.modules.core.hierarchy import AccountHierarchy
+from wallet_keeper.modules.core.dedup import FingerprintIndex
+from wallet_keeper.modules.core.cube import MonthlyCube
+from wallet_keeper.modules.core.balance import BalanceIndex
 from copy import copy, deepcopy
+from bisect import bisect_left, bisect_right
 import datetime
 
 
@@ -12,8 +18,126 @@ class Wallet(object):
         self.account_labels = account
         self.budget_monthly = budget_monthly
         self.budget_yearly = budget_yearly
+        self._sorted = None
+        self._dates = None
+        self._store = None
+        self._hierarchy = None
+        self._fingerprints = None
+        self._cube = None
+        self._balances = None
 
-        pass
+    @property
+    def store(self) -> TransferStore:
+        """
+        Get the columnar transfer store, building it on the first access
+
+        :return: transfer store
+        """
+        if self._store is None:
+            self._store = TransferStore(self._get_sorted(), self.account_labels)
+        return self._store
+
+    def rebuild(self) -> None:
+        """
+        Rebuild the date index, the columnar transfer store, the monthly cube and the balance index, e.g. after the
+        transactions have been modified
+
+        :return:
+        """
+        self._sorted = None
+        self._dates = None
+        self._store = TransferStore(self._get_sorted(), self.account_labels)
+        self._hierarchy = AccountHierarchy(self.store.accounts)
+        self._cube = MonthlyCube(self._store, self._hierarchy)
+        self._balances = BalanceIndex(self._store, self._hierarchy)
+
+    @property
+    def hierarchy(self) -> AccountHierarchy:
+        """
+        Get the account hierarchy with precomputed ancestors of all accounts
+
+        :return: account hierarchy
+        """
+        if self._hierarchy is None:
+            self._hierarchy = AccountHierarchy(self.store.accounts)
+        return self._hierarchy
+
+    @property
+    def cube(self) -> MonthlyCube:
+        """
+        Get the monthly sums of all accounts including their parents, building them on the first access
+
+        :return: monthly cube
+        """
+        if self._cube is None:
+            self._cube = MonthlyCube(self.store, self.hierarchy)
+        return self._cube
+
+    @property
+    def balances(self) -> BalanceIndex:
+        """
+        Get the running balances of all accounts, building them on the first access
+
+        :return: balance index
+        """
+        if self._balances is None:
+            self._balances = BalanceIndex(self.store, self.hierarchy)
+        return self._balances
+
+    @property
+    def fingerprints(self) -> FingerprintIndex:
+        """
+        Get the deduplication index of the transactions, building it on the first access
+
+        :return: fingerprint index
+        """
+        if self._fingerprints is None:
+            self._fingerprints = FingerprintIndex(self.transactions)
+        return self._fingerprints
+
+    def extend(self, transactions: List[Transaction]) -> List[Transaction]:
+        """
+        Add transactions of e.g. an overlapping bank statement, skipping those the wallet already contains
+
+        :param transactions: transactions to add
+        :return: list of skipped duplicates
+        """
+        new, skipped = self.fingerprints.merge(transactions)
+        if new:
+            self.transactions.extend(new)
+            self._sorted = None
+            self._dates = None
+            self._store = None
+            self._hierarchy = None
+            self._cube = None
+            self._balances = None
+
+        return skipped
+
+    def _get_sorted(self) -> List[Transaction]:
+        """
+        Get transactions sorted by date, keeping the journal order of equal dates
+
+        :return: sorted list of transactions
+        """
+        if self._sorted is None:
+            self._sorted = sorted(self.transactions, key=lambda t: t.trans_date if t.trans_date else t.book_date)
+            self._dates = [t.trans_date if t.trans_date else t.book_date for t in self._sorted]
+        return self._sorted
+
+    def get_transactions(self, start_date=None, end_date=None) -> List[Transaction]:
+        """
+        Get transactions within a date range sorted by date
+
+        :param start_date: first day from which transactions should be considered
+        :param end_date: last day up to which transactions should be considered
+        :return: list of transactions
+        """
+        transactions = self._get_sorted()
+        first = bisect_left(self._dates, start_date) if start_date else 0
+        last = bisect_right(self._dates, end_date) if end_date else len(transactions)
+
+        return transactions[first:last]
 
     def _extract_accounts(self):
         """
@@ -62,53 +186,7 @@ class Wallet(object):
         :param end_date: last day up to which transfers should be considered
         :return: DataFrames with transfers, tags, properties and comments
         """
-
-        data = []
-        tags = []
-        properties = []
-        comments = []
-        for t in self.transactions:
-            # Change if in range
-            if start_date:
-                if start_date > t.trans_date:
-                    continue
-
-            if end_date:
-                if t.trans_date > end_date:
-                    continue
-
-            # Add transfers
-            data.extend([(tt.account, self.account_labels[tt.account], t.trans_date, t.book_date, t.name,
-                          tt.amount.value, tt.amount.currency,
-                          tt.price.value, tt.price.currency) for tt in t.transfers])
-
-            t_tags = {k: True for k in t.labels}
-            t_props = t.properties
-            t_comments = ["\n".join(t.comments)]
-
-            for tt in t.transfers:
-                tt_tags = copy(t_tags)
-                tt_tags.update({k: True for k in tt.labels})
-
-                tt_props = copy(t_props)
-                tt_props.update(tt.properties)
-
-                tt_comments = copy(t_comments)
-                tt_comments.extend(["\n"] + ["\n".join(tt.comments)])
-
-                tags.append(tt_tags)
-                properties.append(tt_props)
-                comments.append(tt_comments)
-
-        # Transfer to dataframes
-        df = pandas.DataFrame(data, columns=["account", "category", "date", "booking_date", "name", "amount",
-                                             "amount_currency",
-                                             "price", "price_currency"])
-        df_tags = pandas.DataFrame(tags)
-        df_properties = pandas.DataFrame(properties)
-        df_comments = pandas.DataFrame(comments)
-
-        return df, df_tags, df_properties, df_comments
+        return self.store.get_pandas_transfers(start_date=start_date, end_date=end_date)
 
     def get_pandas_budgets(self) -> (pandas.DataFrame, pandas.DataFrame):
         """
@@ -132,9 +210,11 @@ class Wallet(object):
 
         :return:
         """
-        dates = [t.trans_date for t in self.transactions]
+        self._get_sorted()
+        if not self._dates:
+            raise ValueError("No transactions available to determine the time span!")
 
-        return min(dates), max(dates)
+        return self._dates[0], self._dates[-1]
 
     def get_pandas_totals(self, value="amount", start_date=None, end_date=None, hierarchy: bool = False):
         """
@@ -149,46 +229,26 @@ class Wallet(object):
         if value not in ["amount", "price"]:
             raise ValueError("Unknown argument value {} in get_pandas_totals()".format(value))
 
-        data = []
-        for t in self.transactions:
-            # Change if in range
-            if start_date:
-                if start_date > t.trans_date:
-                    continue
+        df = self.store.get_pandas_totals(value=value, start_date=start_date, end_date=end_date)
 
-            if end_date:
-                if t.trans_date > end_date:
-                    continue
+        if hierarchy:
+            return self.hierarchy.roll_up(df, by=["currency"], values=["amount"])
 
-            data.extend([(tt.account, tt.__getattribute__(value).value, tt.__getattribute__(value).currency)
-                         for tt in t.transfers])
+        else:
+            return df
 
-        df = pandas.DataFrame(data, columns=["account", "amount", "currency"])
-        df = df.groupby(["account", "currency"]).sum().reset_index()
+    def get_balances(self, at=None, hierarchy: bool = False) -> pandas.DataFrame:
+        """
+        Get account balances at the end of a day
+
+        :param at: date up to which transfers are summed up, defaults to all transfers
+        :param hierarchy: a flag to include hierarchy with parent accounts
+        :return: DataFrame with balances for each account
+        """
+        df = self.balances.get_balances(at=at)
 
         if hierarchy:
-            df["parent"] = ""
-            # Rebuild hierarchy backwards
-            df["depth"] = df.account.apply(lambda x: x.count(":"))
-
-            for i in list(range(1, max(df.depth) + 1))[::-1]:
-                mask = df.depth == i
-                groups = df[mask].groupby(["account", "currency"])
-                for name, group in groups:
-                    parent = ":".join(name[0].split(":")[:-1])
-                    df.loc[df.account == name[0], "parent"] = parent
-                    dfg = group
-                    dfg.account = parent
-                    dfg.depth = i - 1
-                    df = pandas.concat([df, dfg])
-
-            return df.groupby(["account", "currency"]).agg({
-                "amount": "sum",
-                "depth": "first",
-                "parent": "first"
-            }).reset_index()
+            return self.hierarchy.roll_up(df, by=["currency"], values=["amount"])
 
         else:
-            return df.groupby(["account", "currency"]).agg({
-                "amount": "sum"
-            }).reset_index()
+            return df
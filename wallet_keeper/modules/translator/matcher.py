@@ -0,0 +1,338 @@
+from wallet_keeper.modules.core.transaction import Transaction
+from wallet_keeper.utils.collection import *
+from typing import List, Dict
+import re
+
+# Characters with a special meaning in a regular expression and quantifiers applying to the preceding character
+re_special = set(".^$*+?{}[]\\|()")
+re_quantifiers = set("*+?{")
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    Find the literal text every match of a pattern has to start with
+
+    :param pattern: regular expression used with re.match
+    :return: literal prefix, empty if there is none or it cannot be determined safely
+    """
+    if "|" in pattern:  # an alternative could start with anything
+        return ""
+
+    i = 0
+    while i < len(pattern) and pattern[i] not in re_special:
+        i += 1
+
+    if i < len(pattern) and pattern[i] in re_quantifiers:
+        i -= 1  # the last literal character is optional or repeated
+
+    return pattern[:max(i, 0)]
+
+
+def _skip_group(pattern: str, i: int) -> int:
+    """
+    Skip a group or a character class
+
+    :param pattern: regular expression
+    :param i: index of the opening parenthesis or bracket
+    :return: index after the closing one
+    """
+    if pattern[i] == "[":
+        i += 1
+        if i < len(pattern) and pattern[i] == "^":
+            i += 1
+        if i < len(pattern) and pattern[i] == "]":  # a leading bracket is a literal
+            i += 1
+        while i < len(pattern) and pattern[i] != "]":
+            i += 2 if pattern[i] == "\\" else 1
+        return i + 1
+
+    depth = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            i = _skip_group(pattern, i)
+            continue
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+
+    return i
+
+
+def _skip_escape(pattern: str, i: int) -> int:
+    """
+    Skip an escape sequence together with its payload, e.g. the code of \\x61 or the name of \\N{...}
+
+    :param pattern: regular expression
+    :param i: index of the backslash
+    :return: index after the escape sequence
+    """
+    e = pattern[i + 1:i + 2]
+    i += 2
+    if e and e in "xuU":
+        n, digits = {"x": 2, "u": 4, "U": 8}[e], "0123456789abcdefABCDEF"
+    elif e == "N":
+        return pattern.find("}", i) + 1 or len(pattern)
+    elif e.isdigit():  # octal escape or group reference
+        n, digits = 2, "0123456789"
+    else:
+        return i
+
+    end = i
+    while end < min(i + n, len(pattern)) and pattern[end] in digits:
+        end += 1
+    return end
+
+
+def required_literal(pattern: str) -> str:
+    """
+    Find the longest literal text every match of a pattern has to contain
+
+    Only literals outside of groups and character classes are considered, a pattern with a top level alternative
+    has none.
+
+    :param pattern: regular expression
+    :return: literal, empty if there is none or it cannot be determined safely
+    """
+    if re.compile(pattern).flags & re.VERBOSE:
+        return ""
+
+    runs = [""]
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "|":
+            return ""
+        elif c == "\\":
+            e = pattern[i + 1:i + 2]
+            if e and not e.isalnum():  # escaped special character
+                runs[-1] += e
+                i += 2
+            else:  # character class, anchor or character code, the code is no literal text
+                runs.append("")
+                i = _skip_escape(pattern, i)
+            continue
+        elif c in "([":
+            runs.append("")
+            i = _skip_group(pattern, i)
+            continue
+        elif c in re_quantifiers:
+            runs[-1] = runs[-1][:-1]  # the last character is optional or repeated
+            runs.append("")
+            if c == "{":
+                i = pattern.find("}", i) + 1 or len(pattern)
+                continue
+        elif c in re_special:
+            runs.append("")
+        else:
+            runs[-1] += c
+        i += 1
+
+    return max(runs, key=len)
+
+
+def _trie_pattern(node: dict) -> str:
+    """
+    Make a regular expression from a trie of literals, the longest literal is preferred
+
+    :param node: trie node, children keyed by character and "" marking the end of a literal
+    :return: regular expression
+    """
+    branches = [re.escape(c) + _trie_pattern(child) for c, child in sorted(node.items()) if c]
+    if not branches:
+        return ""
+
+    pattern = branches[0] if len(branches) == 1 else "(?:{})".format("|".join(branches))
+    if "" in node:
+        pattern = "(?:{})?".format(pattern)
+
+    return pattern
+
+
+class LiteralScanner(object):
+    def __init__(self, literals: List[str]):
+        """
+        Fuse literals into a single regular expression shaped like a trie, so a scan takes time proportional to the
+        text and the literal length, not to the number of literals
+
+        :param literals: non empty literals
+        """
+        literals = set(literals)
+        trie = {}
+        for literal in literals:
+            node = trie
+            for c in literal:
+                node = node.setdefault(c, {})
+            node[""] = {}
+        self.pattern = re.compile("(?=({}))".format(_trie_pattern(trie)))
+
+        # All literals ending a path are prefixes of a longest match at the same position
+        self._prefixes = {}
+        for literal in literals:
+            self._prefixes[literal] = [literal[:j] for j in range(1, len(literal) + 1) if literal[:j] in literals]
+
+    def scan(self, text: str) -> set:
+        """
+        Find all literals contained in a text
+
+        :param text: text to scan
+        :return: set of literals found
+        """
+        found = set()
+        for longest in set(self.pattern.findall(text)):
+            found.update(self._prefixes[longest])
+
+        return found
+
+
+class Condition(object):
+    __slots__ = ("field", "prefix", "literal", "pattern")
+
+    def __init__(self, field: str, pattern: str):
+        """
+        Constructor
+
+        :param field: transaction property to check
+        :param pattern: regular expression the lowercased property has to match
+        """
+        self.field = field
+        try:
+            self.pattern = re.compile(pattern.lower())
+        except re.error:
+            raise ValueError("Failed parsing regex pattern {}".format(pattern))
+        self.prefix = literal_prefix(pattern.lower())
+        self.literal = required_literal(pattern.lower())
+
+    def check(self, value: str) -> bool:
+        """
+        Check a lowercased property value
+
+        :param value: lowercased value
+        :return: True or False
+        """
+        if not value.startswith(self.prefix):
+            return False
+        return self.pattern.match(value) is not None
+
+
+class RuleMatcher(object):
+    def __init__(self, rules: Dict[str, Dict], prefilter=True):
+        """
+        Compile rules for matching
+
+        Conditions are deduplicated per field and regular expressions compiled once, each condition is evaluated at
+        most once per transaction. With the prefilter, literals required by the conditions are fused into one scanner
+        per field, and only rules with an alternative whose literal was found in the text are checked fully.
+
+        :param rules: rules in the order of precedence, each with a single condition dictionary or a list of
+            alternative condition dictionaries under cs_rule
+        :param prefilter: select candidate rules by scanning for required literals
+        """
+        self.names = []
+        self.rules = []  # per rule, list of alternatives, each a list of condition indices
+        self.conditions = []
+        self.fields = []  # fields read by any condition, in order of first use
+        index = {}
+        for name, rule in rules.items():
+            r = rule[cs_rule]
+            if isinstance(r, dict):  # only single rule
+                options = [r]
+            elif isinstance(r, list):  # multiple options for matching possible
+                options = r
+            else:
+                raise ValueError("Rule definition {} not supported.".format(name))
+
+            alternatives = []
+            for option in options:
+                alternative = []
+                for field, pattern in option.items():
+                    key = (field, pattern)
+                    if key not in index:
+                        index[key] = len(self.conditions)
+                        self.conditions.append(Condition(field, pattern))
+                        if field not in self.fields:
+                            self.fields.append(field)
+                    alternative.append(index[key])
+                alternatives.append(alternative)
+
+            self.names.append(name)
+            self.rules.append(alternatives)
+
+        # Key each alternative by its longest required literal, alternatives without one are always checked
+        self._unfiltered = []
+        self._candidates = {}  # rule indices keyed by field and literal
+        for i, alternatives in enumerate(self.rules):
+            for alternative in alternatives:
+                literals = [self.conditions[c] for c in alternative if self.conditions[c].literal] if prefilter else []
+                if not literals:
+                    self._unfiltered.append(i)
+                    break
+                key = max(literals, key=lambda x: len(x.literal))
+                self._candidates.setdefault(key.field, {}).setdefault(key.literal, set()).add(i)
+        self._scanners = {field: LiteralScanner(list(keys)) for field, keys in self._candidates.items()}
+
+    def match(self, trans: Transaction) -> str:
+        """
+        Find the first rule matching a transaction
+
+        :param trans: transaction
+        :return: rule name or None
+        """
+        return self.match_properties(trans.properties)
+
+    def match_properties(self, properties: Dict[str, str]) -> str:
+        """
+        Find the first rule matching transaction properties
+
+        :param properties: transaction properties
+        :return: rule name or None
+        """
+        values = {}
+
+        # Select candidate rules
+        candidates = set(self._unfiltered)
+        for field, scanner in self._scanners.items():
+            value = properties.get(field)
+            if value is not None:
+                values[field] = value.lower()
+                keys = self._candidates[field]
+                for literal in scanner.scan(values[field]):
+                    candidates.update(keys[literal])
+
+        results = [None] * len(self.conditions)
+        for i in sorted(candidates):
+            name = self.names[i]
+            for alternative in self.rules[i]:
+                for c in alternative:
+                    result = results[c]
+                    if result is None:
+                        condition = self.conditions[c]
+                        field = condition.field
+                        if field not in values:
+                            value = properties[field]
+                            values[field] = value.lower() if value is not None else None
+                        value = values[field]
+                        result = value is not None and condition.check(value)
+                        results[c] = result
+                    if not result:
+                        break
+                else:
+                    return name
+
+        return None
+
+    def match_all(self, transactions: List[Transaction]) -> List[str]:
+        """
+        Find the first matching rule of each transaction
+
+        :param transactions: list of transactions
+        :return: rule name or None for each transaction
+        """
+        return [self.match(trans) for trans in transactions]
@@ -2,34 +2,80 @@ from wallet_keeper.modules.core.wallet import Wallet
 from wallet_keeper.modules.core.transaction import Transaction
 from wallet_keeper.modules.core.transfer import Transfer
 from wallet_keeper.modules.core.dosh import Dosh
+from wallet_keeper.modules.translator.matcher import RuleMatcher
 from wallet_keeper.utils.collection import *
 from typing import List, Dict
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
 import re
 
-def _check_match(trans: Transaction, rule: Dict) -> bool:
-    """
-    Check if a rule is a match
+# Rules and matcher of a worker process
+_worker_rules = None
+_worker_matcher = None
 
-    :param data: transaction
-    :param rule: rule to check for
-    :return: True or False
-    """
-    check = True
-    for k, r in rule.items():
-        value = trans.properties[k]
-        if value is not None:
-            try:
-                pattern = re.compile(r.lower())
-            except re.error:
-                raise ValueError("Failed parsing regex pattern {}".format(r))
-            check &= bool(pattern.match(value.lower()))
-        else:
-            check = False
-            break
+_missing = object()
+
+
+class RuleCache(object):
+    def __init__(self, rules: Dict[str, Dict], size: int = 4096):
+        """
+        Least recently used cache of rule decisions
+
+        The decision only depends on the fields the rules read, so it is keyed by their lowercased values and reused
+        for repeated counterparties and messages.
+
+        :param rules: rules to apply
+        :param size: maximum number of decisions to keep
+        """
+        self.matcher = RuleMatcher(rules)
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._decisions = OrderedDict()
+
+    def _key(self, properties: Dict[str, str]) -> tuple:
+        """
+        Make a cache key
+
+        :param properties: transaction properties
+        :return: normalized values of the fields read by the rules
+        """
+        return tuple(
+            v.lower() if isinstance(v, str) else v
+            for v in (properties.get(f, _missing) for f in self.matcher.fields)
+        )
+
+    def match(self, trans: Transaction) -> str:
+        """
+        Find the first rule matching a transaction
 
-    return check
+        :param trans: transaction
+        :return: rule name or None
+        """
+        key = self._key(trans.properties)
+        if key in self._decisions:
+            self.hits += 1
+            self._decisions.move_to_end(key)
+            return self._decisions[key]
 
+        self.misses += 1
+        name = self.matcher.match_properties(
+            {f: v for f, v in zip(self.matcher.fields, key) if v is not _missing})
+        self._decisions[key] = name
+        if len(self._decisions) > self.size:
+            self._decisions.popitem(last=False)
+
+        return name
+
+    def match_all(self, transactions: List[Transaction]) -> List[str]:
+        """
+        Find the first matching rule of each transaction
+
+        :param transactions: list of transactions
+        :return: rule name or None for each transaction
+        """
+        return [self.match(trans) for trans in transactions]
 
 def _process_transaction(trans: Transaction, name: str, rule: Dict) -> None:
     """
@@ -134,50 +180,103 @@ def _process_transaction(trans: Transaction, name: str, rule: Dict) -> None:
 
     pass
 
-def _apply_rules(transactions: List[Transaction], rules: Dict[str, Dict]) -> None:
+def _apply_rules(transactions: List[Transaction], rules: Dict[str, Dict], cache: RuleCache) -> None:
     """
     Apply rules and process transactions
 
     :param transactions: list of transactions
     :param rules: rules to apply
+    :param cache: rule decision cache for the same rules
     """
 
-    # Assign rules
-    matcher = [""] * len(transactions)
-    for name, rule in rules.items():
-        match = False
-        for i, trans in enumerate(transactions):
-            if len(matcher[i]) == 0:  # transaction not yet matched
-                r = rule[cs_rule]
-
-                if isinstance(r, dict):  # only single rule
-                    match = _check_match(trans, r)
-
-                elif isinstance(r, list):  # multiple options for matching possible
-                    for ri in r:
-                        match = _check_match(trans, ri)
-                        if match:
-                            break
-                else:
-                    raise ValueError("Rule definition {} not supported.".format(name))
-
-                if match:
-                    matcher[i] = name
+    # Assign rules, the first matching rule wins
+    matcher = cache.match_all(transactions)
 
     # Process rules and write
     for i, trans in enumerate(transactions):
-        if len(matcher[i]) > 0:
+        if matcher[i] is not None:
             _process_transaction(trans, matcher[i], rules[matcher[i]])
 
-def process_wallet(wallet: Wallet, rules: Dict[str, Dict], ) -> Wallet:
+
+def _init_worker(rules: Dict[str, Dict], size: int) -> None:
+    """
+    Compile rules once per worker process
+
+    :param rules: rules to apply
+    :param size: size of the rule decision cache
+    """
+    global _worker_rules, _worker_matcher
+    _worker_rules = rules
+    _worker_matcher = RuleCache(rules, size)
+
+
+def _process_chunk(transactions: List[Transaction]) -> (List[tuple], int, int):
+    """
+    Apply rules to a chunk of transactions in a worker process
+
+    :param transactions: list of transactions
+    :return: per transaction the processed fields (trans_date, labels, properties, comments, name, transfers), or
+        None if no rule matched, and cache hits and misses of the chunk
+    """
+    hits, misses = _worker_matcher.hits, _worker_matcher.misses
+    output = []
+    for trans, name in zip(transactions, _worker_matcher.match_all(transactions)):
+        if name is None:
+            output.append(None)
+        else:
+            _process_transaction(trans, name, _worker_rules[name])
+            output.append((trans.trans_date, trans.labels, trans.properties, trans.comments, trans.name,
+                           trans.transfers))
+
+    return output, _worker_matcher.hits - hits, _worker_matcher.misses - misses
+
+
+def _apply_rules_parallel(transactions: List[Transaction], rules: Dict[str, Dict], workers: int,
+                          cache: RuleCache) -> None:
+    """
+    Apply rules and process transactions in a process pool, with the same result as _apply_rules
+
+    :param transactions: list of transactions
+    :param rules: rules to apply
+    :param workers: number of worker processes
+    :param cache: rule decision cache for the same rules, each worker keeps its own cache of the same size and the
+        counters are added up here
+    """
+    size = max(1, -(-len(transactions) // (4 * workers)))
+    chunks = [transactions[i:i + size] for i in range(0, len(transactions), size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules, cache.size)) as executor:
+        for output, hits, misses in executor.map(_process_chunk, chunks):
+            results.extend(output)
+            cache.hits += hits
+            cache.misses += misses
+
+    # Update transactions in place like the serial path does
+    for trans, result in zip(transactions, results):
+        if result is not None:
+            trans.trans_date, trans.labels, trans.properties, trans.comments, trans.name, trans.transfers = result
+
+            rule = rules[trans.name]
+            if type(rule[cs_to]) != list:
+                rule[cs_to] = [rule[cs_to]]
+
+
+def process_wallet(wallet: Wallet, rules: Dict[str, Dict], workers: int = None, cache: RuleCache = None) -> Wallet:
     """
     Write processed data to a file
 
     :param wallet: wallet to process
     :param rules: rules to assign transactions to accounts
+    :param workers: number of worker processes, the transactions are processed serially if None or 1
+    :param cache: rule decision cache created for the same rules, e.g. to read its counters afterwards
     :return: processed wallet
     """
-    _apply_rules(wallet.transactions, rules)
+    if cache is None:
+        cache = RuleCache(rules)
 
+    if workers and workers > 1 and len(wallet.transactions) > 1:
+        _apply_rules_parallel(wallet.transactions, rules, workers, cache)
+    else:
+        _apply_rules(wallet.transactions, rules, cache)
 
     return wallet
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List
+from typing import Iterator, List
 import pandas
 
 
@@ -16,3 +16,14 @@ class ParserBase(object):
         :return: dictionary with data as lists
         """
         pass
+
+    def iter_read(self, path: Path, raw=True, **kwargs) -> Iterator:
+        """
+        Translate input to transactions lazily, readers able to stream their input override this
+
+        :param path: file to translate
+        :param raw: read data as is
+        :param kwargs: reader specific arguments
+        :return: iterator over transactions
+        """
+        yield from self.read(path, raw, **kwargs).transactions
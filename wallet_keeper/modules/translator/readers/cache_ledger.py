@@ -0,0 +1,212 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import List, Tuple
+
+
+class JournalCache(object):
+    """
+    On-disk cache of parsed ledger files
+
+    Each file, including files pulled in through include directives, gets its own entry holding the parse result,
+    the file stamp (modification time and size), a content digest and the list of included files. An entry is fresh
+    while the stamp matches, or when only the modification time changed and the digest still matches, and all
+    included files are fresh as well. The transactions of included files are only kept in their own entries, the
+    entry of the including file refers to them.
+    """
+
+    version = 2  # entries of other versions are parsed again
+
+    def __init__(self, directory: Path):
+        """
+        Constructor
+
+        :param directory: directory in which to keep the cache entries
+        """
+        self.directory = Path(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self._meta = {}
+
+    @staticmethod
+    def _stamp(path: Path) -> (int, int):
+        """
+        Get the file stamp
+
+        :param path: file path
+        :return: modification time in nanoseconds and size in bytes
+        """
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _digest(path: Path) -> str:
+        """
+        Hash the file content
+
+        :param path: file path
+        :return: hex digest
+        """
+        with open(path, "rb") as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+    def _entry(self, path: Path, raw: bool) -> Path:
+        """
+        Get the entry file of a journal file
+
+        :param path: journal file
+        :param raw: read data as is
+        :return: entry file
+        """
+        key = "{}|{}".format(Path(path).resolve(), raw)
+        return self.directory / "{}.pickle".format(hashlib.sha1(key.encode()).hexdigest())
+
+    def _load_meta(self, path: Path, raw: bool) -> dict:
+        """
+        Load only the metadata of an entry, the entry file stores the metadata and the result as two pickles
+
+        :param path: journal file
+        :param raw: read data as is
+        :return: metadata or None if there is no entry
+        """
+        key = (Path(path), raw)
+        if key not in self._meta:
+            try:
+                with open(self._entry(path, raw), "rb") as f:
+                    self._meta[key] = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                self._meta[key] = None
+
+        return self._meta[key]
+
+    def is_fresh(self, path: Path, raw: bool) -> bool:
+        """
+        Check whether a file and all the files it includes have fresh entries
+
+        :param path: journal file
+        :param raw: read data as is
+        :return: true if the cached result can be used
+        """
+        meta = self._load_meta(path, raw)
+        if meta is None or meta.get("version") != JournalCache.version:
+            return False
+
+        try:
+            stamp = self._stamp(path)
+        except OSError:
+            return False
+
+        if stamp != meta["stamp"]:
+            if stamp[1] != meta["stamp"][1] or self._digest(path) != meta["digest"]:
+                return False
+            self._touch(path, raw, stamp)
+
+        return all(self.is_fresh(include, raw) for include in meta["includes"])
+
+    def _touch(self, path: Path, raw: bool, stamp: (int, int)):
+        """
+        Update the stamp of an entry whose content did not change
+
+        :param path: journal file
+        :param raw: read data as is
+        :param stamp: new stamp
+        """
+        meta = self._load_meta(path, raw)
+        result = self._load_result(path, raw)
+        meta["stamp"] = stamp
+        self._write(path, raw, meta, result)
+
+    def _load_result(self, path: Path, raw: bool) -> tuple:
+        """
+        Load the parse result of an entry
+
+        :param path: journal file
+        :param raw: read data as is
+        :return: parse result
+        """
+        with open(self._entry(path, raw), "rb") as f:
+            pickle.load(f)  # skip the metadata
+            return pickle.load(f)
+
+    def _write(self, path: Path, raw: bool, meta: dict, result: tuple):
+        """
+        Write an entry atomically
+
+        :param path: journal file
+        :param raw: read data as is
+        :param meta: entry metadata
+        :param result: parse result
+        """
+        entry = self._entry(path, raw)
+        tmp = entry.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry)
+        self._meta[(Path(path), raw)] = meta
+
+    def _assemble(self, path: Path, raw: bool) -> tuple:
+        """
+        Load the parse result of an entry, filling in the transactions of the included files from their entries
+
+        :param path: journal file
+        :param raw: read data as is
+        :return: parse result
+        """
+        segments, account_labels, budget_monthly, budget_yearly = self._load_result(path, raw)
+        transactions = []
+        for segment in segments:
+            if isinstance(segment, Path):
+                transactions.extend(self._assemble(segment, raw)[0])
+            else:
+                transactions.extend(segment)
+
+        return transactions, account_labels, budget_monthly, budget_yearly
+
+    def load(self, path: Path, raw: bool) -> tuple:
+        """
+        Load a parse result if the entry is fresh
+
+        :param path: journal file
+        :param raw: read data as is
+        :return: parse result or None
+        """
+        if not self.is_fresh(path, raw):
+            return None
+
+        try:
+            return self._assemble(path, raw)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def snapshot(self, path: Path) -> dict:
+        """
+        Take the stamp and the digest of a file, before it is parsed, so a change during the parse is detected on the
+        next freshness check instead of being stored as fresh
+
+        :param path: journal file
+        :return: stamp and digest
+        """
+        return {"stamp": self._stamp(path), "digest": self._digest(path)}
+
+    def store(self, path: Path, raw: bool, snapshot: dict, includes: List[Tuple[Path, int, int]], result: tuple):
+        """
+        Store a parse result
+
+        :param path: journal file
+        :param raw: read data as is
+        :param snapshot: stamp and digest taken before parsing
+        :param includes: included files with the range of their transactions in the result
+        :param result: parse result
+        """
+        transactions, account_labels, budget_monthly, budget_yearly = result
+        segments = []
+        last = 0
+        for include, start, stop in includes:
+            segments.extend([transactions[last:start], Path(include)])
+            last = stop
+        segments.append(transactions[last:])
+
+        meta = dict(snapshot, version=JournalCache.version, includes=[include for include, _, _ in includes])
+        segments = [s for s in segments if isinstance(s, Path) or s]
+        self._write(path, raw, meta, (segments, account_labels, budget_monthly, budget_yearly))
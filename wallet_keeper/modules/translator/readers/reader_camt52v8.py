@@ -1,7 +1,7 @@
 from pathlib import Path
-from typing import List, Dict
+from typing import Iterator, List, Dict
 import xml.etree.ElementTree as ET
-from wallet_keeper.utils.xml_util import get_namespace, get_value, get_attr, get_element
+from wallet_keeper.utils.xml_util import get_namespace, get_value, PathSelector
 from wallet_keeper.modules.translator.readers.base import ParserBase
 from wallet_keeper.utils.collection import *
 from wallet_keeper.modules.core.transaction import Transaction
@@ -28,6 +28,136 @@ class ReaderCAMT52v8(ParserBase):
     def __init__(self):
         pass
 
+    @staticmethod
+    def _entry_selector(ns: Dict[str, str]) -> PathSelector:
+        """
+        Compile the paths of entry fields for a document
+
+        :param ns: namespaces
+        :return: selector
+        """
+        details = "ns:NtryDtls/ns:TxDtls/"
+        parties = details + "ns:RltdPties/"
+        return PathSelector(
+            {
+                "status": "ns:Sts/ns:Cd",
+                "valdate": "ns:ValDt/ns:Dt",
+                "addinfo": "ns:AddtlNtryInf",
+                "parties": parties[:-1],  # required container
+                "creditor_name": parties + "ns:Cdtr/ns:Pty/ns:Nm",
+                "creditor_acct": parties + "ns:CdtrAcct/ns:Id/ns:IBAN",
+                "debtor_name": parties + "ns:Dbtr/ns:Pty/ns:Nm",
+                "debtor_acct": parties + "ns:DbtrAcct/ns:Id/ns:IBAN",
+                "amount": details + "ns:Amt",
+                "remittance": details + "ns:RmtInf",  # required container
+                "messages": details + "ns:RmtInf/ns:Ustrd",
+            },
+            ns,
+            optional=["creditor_name", "creditor_acct", "debtor_name", "debtor_acct"],
+            multiple=["messages"]
+        )
+
+    @staticmethod
+    def _read_entry(entry: ET.Element, selector: PathSelector, account: str, institution: str,
+                    raw=True) -> Transaction:
+        """
+        Translate a single entry
+
+        :param entry: Ntry element
+        :param selector: selector of entry fields
+        :param account: account IBAN
+        :param institution: account institution
+        :param raw: read data as is
+        :return: transaction
+        """
+        fields = selector.select(entry)
+
+        def text(name):
+            element = fields[name]
+            return element.text if element is not None else None
+
+        # Basic
+        status = text("status")
+        valdate = datetime.strptime(text("valdate"), "%Y-%m-%d")
+        addinfo = text("addinfo")
+
+        # Parties
+        creditor_name = text("creditor_name")
+        creditor_acct = text("creditor_acct")
+        debtor_name = text("debtor_name")
+        debtor_acct = text("debtor_acct")
+
+        # Amount
+        amount = Decimal(text("amount"))
+        if "Ccy" not in fields["amount"].attrib:
+            raise AttributeError("{} doesn't include the attribute {}".format(fields["amount"].tag, "Ccy"))
+        currency = fields["amount"].attrib["Ccy"]
+
+        # Message
+        message = " ".join(msg.text for msg in fields["messages"])
+
+        data = {
+            cs_account: account,
+            cs_institution: institution,
+            cs_status: status,
+            cs_valdate: valdate,
+            cs_addinfo: addinfo,
+            cs_creditor_name: creditor_name,
+            cs_creditor_account: creditor_acct,
+            cs_debtor_name: debtor_name,
+            cs_debtor_account: debtor_acct,
+            cs_amount: amount,
+            cs_currency: currency,
+            cs_message: message
+        }
+
+        return Transaction(
+            valdate, valdate, "Raw",
+            [], data, [],
+            [], raw=raw
+        )
+
+    @staticmethod
+    def iter_read(path: Path, raw=True, **kwargs) -> Iterator[Transaction]:
+        """
+        Translate input to transactions lazily, streaming the file
+
+        Entries are removed from the tree once translated, so memory does not grow with the file size.
+
+        :param path: file to translate
+        :param raw: read data as is
+        :param kwargs: reader specific arguments
+        :return: iterator over transactions
+        """
+        ns = None
+        selector = None
+        account = None
+        institution = None
+        acct_seen = False
+        stack = []
+        for event, element in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                if ns is None:
+                    ns = {"ns": get_namespace(element)}
+                    selector = ReaderCAMT52v8._entry_selector(ns)
+                stack.append(element)
+                continue
+
+            stack.pop()
+            if len(stack) != 3:  # only children of Document/BkToCstmrAcctRpt/Rpt
+                continue
+
+            tag = element.tag.rpartition("}")[2]
+            if tag == "Acct" and not acct_seen:  # account information of the first report
+                account = get_value(element, "ns:Id/ns:IBAN", ns)
+                institution = get_value(element, "ns:Svcr/ns:FinInstnId/ns:Nm", ns)
+                acct_seen = True
+            elif tag == "Ntry":
+                if not acct_seen:
+                    raise AttributeError("{} doesn't include account information before the entries".format(path))
+                yield ReaderCAMT52v8._read_entry(element, selector, account, institution, raw)
+                stack[-1].remove(element)
+
     @staticmethod
     def _read(path: Path, raw=True, **kwargs) -> List[Transaction]:
         """
@@ -38,67 +168,7 @@ class ReaderCAMT52v8(ParserBase):
         :param kwargs: reader specific arguments
         :return: list of transactions
         """
-        tree = ET.parse(path)
-        root = tree.getroot()
-        ns = {"ns": get_namespace(root)}
-
-        # Account information
-        acct = get_element(root, "ns:BkToCstmrAcctRpt/ns:Rpt/ns:Acct", ns)
-        account = get_value(acct, "ns:Id/ns:IBAN", ns)
-        institution = get_value(acct, "ns:Svcr/ns:FinInstnId/ns:Nm", ns)
-
-        # Transactions
-        transactions = []
-        for entry in root.findall("ns:BkToCstmrAcctRpt/ns:Rpt/ns:Ntry", ns):
-            details = get_element(entry, "ns:NtryDtls/ns:TxDtls", ns)
-
-            # Basic
-            status = get_value(entry, "ns:Sts/ns:Cd", ns)
-            valdate = datetime.strptime(get_value(entry, "ns:ValDt/ns:Dt", ns), "%Y-%m-%d")
-            addinfo = get_value(entry, "ns:AddtlNtryInf", ns)
-
-            # Parties
-            parties = get_element(details, "ns:RltdPties", ns)
-            creditor_name = get_value(parties, "ns:Cdtr/ns:Pty/ns:Nm", ns, empty=True)
-            creditor_acct = get_value(parties, "ns:CdtrAcct/ns:Id/ns:IBAN", ns, empty=True)
-            debtor_name = get_value(parties, "ns:Dbtr/ns:Pty/ns:Nm", ns, empty=True)
-            debtor_acct = get_value(parties, "ns:DbtrAcct/ns:Id/ns:IBAN", ns, empty=True)
-
-            # Amount
-            amount = Decimal(get_value(details, "ns:Amt", ns))
-            currency = get_attr(details, "ns:Amt", ns, "Ccy")
-
-            # Message
-            messages = get_element(details, "ns:RmtInf", ns).findall("ns:Ustrd", ns)
-            msgs = []
-            for msg in messages:
-                msgs.append(msg.text)
-            message = " ".join(msgs)
-
-            data = {
-                cs_account: account,
-                cs_institution: institution,
-                cs_status: status,
-                cs_valdate: valdate,
-                cs_addinfo: addinfo,
-                cs_creditor_name: creditor_name,
-                cs_creditor_account: creditor_acct,
-                cs_debtor_name: debtor_name,
-                cs_debtor_account: debtor_acct,
-                cs_amount: amount,
-                cs_currency: currency,
-                cs_message: message
-            }
-
-            transactions.append(
-                Transaction(
-                    valdate, valdate, "Raw",
-                    [], data, [],
-                    [], raw=raw
-                )
-            )
-
-        return transactions
+        return list(ReaderCAMT52v8.iter_read(path, raw, **kwargs))
 
     @staticmethod
     def read(path: Path, raw=True, **kwargs) -> Wallet:
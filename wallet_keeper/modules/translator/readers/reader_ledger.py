@@ -1,9 +1,16 @@
 import decimal
+import hashlib
+import io
+import pickle
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from typing import List, Dict
 from wallet_keeper.modules.translator.readers.base import ParserBase
-import re
+from wallet_keeper.modules.translator.readers.cache_ledger import JournalCache
+from wallet_keeper.modules.translator.readers.tokenizer_ledger import find_dates, parse_date, split_comments, \
+    split_transfer
 from pathlib import Path
-from datetime import datetime
 from wallet_keeper.modules.core.transaction import Transaction
 from wallet_keeper.modules.core.transfer import Transfer
 from wallet_keeper.modules.core.dosh import Dosh
@@ -21,11 +28,112 @@ class ReaderLedgerBuilder(object):
         return self._instance
 
 
+class LedgerCheckpoint(object):
+    """
+    Parser state at the last transaction boundary of a file, used to parse only the appended tail on the next read
+
+    The state is kept pickled, so wallets built from the checkpoint never share objects with each other or with the
+    checkpoint and may be modified in place.
+    """
+
+    def __init__(self, offset: int, line: int, digest: str, transactions: List[Transaction],
+                 account_labels: Dict[str, str], budget_monthly: Transaction, budget_yearly: Transaction):
+        """
+        Constructor
+
+        :param offset: text offset right after the boundary
+        :param line: index of the first line after the boundary
+        :param digest: digest of the text before the offset
+        :param transactions: transactions read before the boundary
+        :param account_labels: account labels read before the boundary
+        :param budget_monthly: monthly budget read before the boundary
+        :param budget_yearly: yearly budget read before the boundary
+        """
+        self.offset = offset
+        self.line = line
+        self.digest = digest
+        self._state = pickle.dumps((transactions, account_labels, budget_monthly, budget_yearly),
+                                   protocol=pickle.HIGHEST_PROTOCOL)
+
+    def restore(self) -> (List[Transaction], Dict[str, str], Transaction, Transaction):
+        """
+        Get a fresh copy of the parser state
+
+        :return: transactions, account labels, monthly budget and yearly budget read before the boundary
+        """
+        return pickle.loads(self._state)
+
+    @staticmethod
+    def hash(text: str) -> str:
+        """
+        Hash a text prefix
+
+        :param text: text
+        :return: hex digest
+        """
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def matches(self, text: str) -> bool:
+        """
+        Check whether a file content still starts with the text this checkpoint was taken from
+
+        :param text: file content
+        :return: true if parsing can resume from the checkpoint
+        """
+        return len(text) >= self.offset and self.hash(text[:self.offset]) == self.digest
+
+
+class CheckpointStore(object):
+    def __init__(self, size: int = 16):
+        """
+        Least recently used checkpoints of incrementally read files, keyed by path and raw flag
+
+        :param size: maximum number of checkpoints to keep
+        """
+        self.size = size
+        self._checkpoints = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._checkpoints)
+
+    def get(self, key: tuple) -> LedgerCheckpoint:
+        """
+        Get the checkpoint of a file
+
+        :param key: path and raw flag
+        :return: checkpoint or None
+        """
+        checkpoint = self._checkpoints.get(key)
+        if checkpoint is not None:
+            self._checkpoints.move_to_end(key)
+        return checkpoint
+
+    def put(self, key: tuple, checkpoint: LedgerCheckpoint):
+        """
+        Remember the checkpoint of a file, evicting the least recently used one if the store is full
+
+        :param key: path and raw flag
+        :param checkpoint: checkpoint
+        """
+        self._checkpoints[key] = checkpoint
+        self._checkpoints.move_to_end(key)
+        if len(self._checkpoints) > self.size:
+            self._checkpoints.popitem(last=False)
+
+    def pop(self, key: tuple):
+        """
+        Forget the checkpoint of a file
+
+        :param key: path and raw flag
+        """
+        self._checkpoints.pop(key, None)
+
+
 class ReaderLedger(ParserBase):
     format = "ledger"
 
     def __init__(self):
-        pass
+        self.checkpoints = CheckpointStore()  # checkpoints of the files read incrementally by this reader
 
     @staticmethod
     def _extract_comments(line) -> (List[str], Dict[str, str], List[str]):
@@ -35,42 +143,7 @@ class ReaderLedger(ParserBase):
         :param line: line to process
         :return:
         """
-        labels = []
-        properties = {}
-        comments = []
-
-        messages = line.strip().split(";")[1:]
-        if len(messages) > 0:
-            for message in messages:
-                msg = message
-
-                # Check for labels
-                potential_labels = ["".join(e) for e in re.findall(r"(?>:(\S))(.*?)(?=(\S):)", msg)]
-                if len(potential_labels) > 0:
-                    labels.extend(potential_labels)
-                for label in potential_labels:
-                    msg = msg.replace(label + ":", "")
-                msg = msg.replace(" :","").strip()
-
-                potential_tags = re.findall(r"(^[A-z].*\S:)", msg)
-                n = len(potential_tags)
-                for j, tag in enumerate(potential_tags):
-                    if j == n - 1:
-                        value = re.findall(potential_tags[j] + r"(.*)",
-                                           msg)[0].strip()
-                    else:
-                        value = re.findall(potential_tags[j] + r"(.*)" + potential_tags[j + 1],
-                                           msg)[0].strip()
-
-                    name = tag.replace(":", "").strip()
-                    properties[name] = value
-                    msg = msg.replace(tag, "")
-                    msg = msg.replace(value, "")
-
-                if msg.strip():
-                    comments.append(msg.strip())
-
-        return labels, properties, comments
+        return split_comments(line)
 
     @staticmethod
     def _extract_transfer(line, i, path) -> (str, Dosh, Dosh, List[str], Dict[str, str], List[str]):
@@ -82,17 +155,7 @@ class ReaderLedger(ParserBase):
         :param path: file path
         :return: account, amount, price, labels, tags, comments
         """
-        # Check for labels, tags and comments
-        l, t, c = ReaderLedger._extract_comments(line)
-
-        if l or t or c:
-            entry = line.split(";")[0]
-        else:
-            entry = line
-
-        # Process actual values
-        account = entry.split("  ")[0]
-        fields = list(filter(None, entry.replace(account, "").split(" ")))
+        account, fields, l, t, c = split_transfer(line)
 
         # Deal with prices
         if len(fields) == 0:
@@ -115,22 +178,137 @@ class ReaderLedger(ParserBase):
         return account, amount, price, l, t, c
 
     @staticmethod
-    def _read(path: Path, raw=True, **kwargs) -> (List[Transaction], Dict[str, str], Transaction, Transaction):
+    def _find_includes(path: Path) -> List[Path]:
+        """
+        Find files directly included by a file
+
+        :param path: file to scan
+        :return: included files in include order
+        """
+        with open(path, "r") as f:
+            return [path.parent / line.split(" ")[1].strip() for line in f if line.startswith("include")]
+
+    @staticmethod
+    def find_files(path: Path) -> List[Path]:
+        """
+        Find a file and all files it includes, directly or through other included files
+
+        :param path: root file
+        :return: files in include order, each listed once
+        """
+        files = []
+        seen = set()
+        stack = [path]
+        while stack:
+            p = stack.pop()
+            if p in seen:
+                continue
+            seen.add(p)
+            files.append(p)
+            stack.extend(reversed(ReaderLedger._find_includes(p)))
+
+        return files
+
+    @staticmethod
+    def _find_leaves(path: Path) -> List[Path]:
+        """
+        Walk the include graph of a file and find included files which do not include anything themselves
+
+        :param path: root file
+        :return: leaf files in include order, each listed once
+        """
+        leaves = []
+        seen = {path}
+        stack = list(reversed(ReaderLedger._find_includes(path)))
+        while stack:
+            p = stack.pop()
+            if p in seen:
+                continue
+            seen.add(p)
+
+            includes = ReaderLedger._find_includes(p)
+            if includes:
+                stack.extend(reversed(includes))
+            else:
+                leaves.append(p)
+
+        return leaves
+
+    @staticmethod
+    def _read_parallel(path: Path, raw=True, workers: int = None, cache: JournalCache = None,
+                       checkpoints: CheckpointStore = None, **kwargs) \
+            -> (List[Transaction], Dict[str, str], Transaction, Transaction):
+        """
+        Translate input to an output, parsing included files in a process pool
+
+        :param path: file to translate
+        :param raw: read data as is
+        :param workers: number of worker processes, defaults to the number of processors
+        :param cache: cache of parsed files
+        :param checkpoints: checkpoints to resume appended files from, None parses the files completely
+        :param kwargs: reader specific arguments
+        :return: transactions, account labels, monthly budget and yearly budget
+        """
+        if cache is not None and cache.is_fresh(path, raw):
+            return ReaderLedger._read(path, raw, cache=cache, checkpoints=checkpoints, **kwargs)
+
+        leaves = ReaderLedger._find_leaves(path)
+        if cache is not None:
+            leaves = [leaf for leaf in leaves if not cache.is_fresh(leaf, raw)]
+        if len(leaves) < 2:
+            return ReaderLedger._read(path, raw, cache=cache, checkpoints=checkpoints, **kwargs)
+
+        snapshots = {leaf: cache.snapshot(leaf) for leaf in leaves} if cache is not None else {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = dict(zip(leaves, executor.map(partial(ReaderLedger._read, raw=raw, **kwargs), leaves)))
+
+        if cache is not None:
+            for leaf, result in parsed.items():
+                cache.store(leaf, raw, snapshots[leaf], [], result)
+
+        return ReaderLedger._read(path, raw, parsed=parsed, cache=cache, checkpoints=checkpoints, **kwargs)
+
+    @staticmethod
+    def _read(path: Path, raw=True, parsed: Dict[Path, tuple] = None, cache: JournalCache = None,
+              checkpoints: CheckpointStore = None, **kwargs) \
+            -> (List[Transaction], Dict[str, str], Transaction, Transaction):
         """
         Translate input to an output
 
         :param path: file to translate
         :param raw: read data as is
+        :param parsed: already parsed included files, each used once in place of reading the file again
+        :param cache: cache of parsed files, fresh entries are loaded instead of parsing and new results are stored
+        :param checkpoints: checkpoints to resume from the last transaction boundary if the file was only appended
+            to since the previous read, the new boundary is remembered; None parses the file completely
         :param kwargs: reader specific arguments
-        :return: wallet instance
+        :return: transactions, account labels, monthly budget and yearly budget
         """
+        if cache is not None:
+            result = cache.load(path, raw)
+            if result is not None:
+                return result
+            snapshot = cache.snapshot(path)
+
         with open(path, "r") as f:
-            lines = f.readlines()
+            text = f.read()
 
         # Define variables
         account_labels = {}
         budget_monthly = None
         budget_yearly = None
+        transactions = []
+        start = 0
+        first_line = 0
+
+        # Resume an appended file
+        incremental = checkpoints is not None
+        checkpoint = checkpoints.get((path, raw)) if incremental else None
+        if checkpoint is not None and checkpoint.matches(text):
+            start = checkpoint.offset
+            first_line = checkpoint.line
+            transactions, account_labels, budget_monthly, budget_yearly = checkpoint.restore()
+        lines = io.StringIO(text[start:]).readlines()
         budg_factor = 1
         trans_date = None
         book_date = None
@@ -147,15 +325,25 @@ class ReaderLedger(ParserBase):
         price = None
 
         # Go over lines
-        transactions = []
+        includes = []
+        offset = start
+        boundary = None
+        boundary_labels = None
+        labels_changed = True
         transaction_open = False
         transfer_open = False
         budg_m_opened = False
         budg_y_opened = False
-        for i, line in enumerate(lines):
+        for i, line in enumerate(lines, first_line):
+            offset += len(line)
             if line.startswith("include"):
                 include_path = path.parent / line.split(" ")[1].strip()
-                tr, al, bm, by = ReaderLedger._read(include_path, raw=raw, **kwargs)
+                if parsed and include_path in parsed:
+                    tr, al, bm, by = parsed.pop(include_path)
+                else:
+                    tr, al, bm, by = ReaderLedger._read(include_path, raw=raw, parsed=parsed, cache=cache,
+                                                        checkpoints=checkpoints, **kwargs)
+                includes.append((include_path, len(transactions), len(transactions) + len(tr)))
                 transactions.extend(tr)
                 account_labels.update(al)
                 budget_monthly = bm if bm else budget_monthly
@@ -169,6 +357,7 @@ class ReaderLedger(ParserBase):
                 else:
                     cat = None
                 account_labels.update({acc: cat})
+                labels_changed = True
             elif line.startswith("~ Monthly"):
                 budg_m_opened = True
                 budg_y_opened = False
@@ -177,12 +366,12 @@ class ReaderLedger(ParserBase):
                 budg_y_opened = True
             else:
                 # Check for a date
-                pattern = "([0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9])"
-                match = re.findall(pattern, line)
+                match = find_dates(line)
+                entry = line.strip()
 
                 if len(match) == 0 and not (transaction_open or budg_m_opened or budg_y_opened):  # skip initial lines of a file till a transaction is detected
                     continue
-                elif not line.strip():
+                elif not entry:
                     if transaction_open:
                         if transfer_open:
                             transfers.append(Transfer(account, amount, price, tt_labels, tt_properties, tt_comments))
@@ -223,6 +412,14 @@ class ReaderLedger(ParserBase):
                     t_comments = []
                     transfers = []
 
+                    # Remember the boundary, the state before an include also depends on the included file and a
+                    # transfer still pending after a budget block is carried into the next transaction
+                    if incremental and not includes and not transfer_open:
+                        if labels_changed:
+                            boundary_labels = dict(account_labels)
+                            labels_changed = False
+                        boundary = (offset, i + 1, len(transactions), boundary_labels, budget_monthly, budget_yearly)
+
                 # First line of a transaction
                 # ---------------------------
                 elif len(match) > 0:
@@ -235,20 +432,20 @@ class ReaderLedger(ParserBase):
 
                     # Read dates
                     if len(match) == 1:
-                        trans_date = datetime.strptime(match[0], "%Y-%m-%d")
+                        trans_date = parse_date(match[0])
                         book_date = trans_date
                     elif len(match) == 2:
-                        trans_date = datetime.strptime(match[0], "%Y-%m-%d")
-                        book_date = datetime.strptime(match[1], "%Y-%m-%d")
+                        trans_date = parse_date(match[0])
+                        book_date = parse_date(match[1])
                     else:
                         raise ValueError("Unknown date definition detected on the line {} of {}".format(i, path))
 
-                    name = " ".join(line.strip().split(" ")[1:])
+                    name = " ".join(entry.split(" ")[1:])
 
                     continue  # skip to the next line
 
                 # Check for transaction wide tags and comments
-                if line.strip().startswith(";"):
+                if entry.startswith(";"):
                     l, t, c = ReaderLedger._extract_comments(line)
                     if transfer_open:
                         if len(l) > 0:
@@ -269,7 +466,6 @@ class ReaderLedger(ParserBase):
                 else:
                     # Process transfers
                     # -----------------
-                    entry = line.strip()
                     if entry:
                         if transfer_open:
                             transfers.append(Transfer(account, amount, price, tt_labels, tt_properties, tt_comments))
@@ -316,18 +512,39 @@ class ReaderLedger(ParserBase):
                     transfers, raw=raw
                 )
 
+        if boundary is not None:
+            offset, first_line, n, labels, bm, by = boundary
+            checkpoints.put((path, raw), LedgerCheckpoint(
+                offset, first_line, LedgerCheckpoint.hash(text[:offset]), transactions[:n], labels, bm, by))
+        elif incremental and start == 0:
+            checkpoints.pop((path, raw))
+
+        if cache is not None:
+            cache.store(path, raw, snapshot, includes, (transactions, account_labels, budget_monthly, budget_yearly))
+
         return transactions, account_labels, budget_monthly, budget_yearly
 
-    @staticmethod
-    def read(path: Path, raw=True, **kwargs) -> Wallet:
+    def read(self, path: Path, raw=True, parallel=False, workers: int = None, cache: Path = None, incremental=False,
+             **kwargs) -> Wallet:
         """
         Translate input to an output
 
         :param path: list of files to translate
         :param raw: read data as is
+        :param parallel: parse included files in a process pool
+        :param workers: number of worker processes for the parallel mode
+        :param cache: directory with a cache of parsed files, only changed files are parsed again
+        :param incremental: parse only what was appended to files since they were last read by this reader
         :param kwargs: reader specific arguments
         :return: wallet instance
         """
-        transactions, account_labels, budget_monthly, budget_yearly = ReaderLedger._read(path, raw, **kwargs)
+        journal_cache = JournalCache(cache) if cache else None
+        checkpoints = self.checkpoints if incremental else None
+        if parallel:
+            transactions, account_labels, budget_monthly, budget_yearly = \
+                ReaderLedger._read_parallel(path, raw, workers, cache=journal_cache, checkpoints=checkpoints, **kwargs)
+        else:
+            transactions, account_labels, budget_monthly, budget_yearly = \
+                ReaderLedger._read(path, raw, cache=journal_cache, checkpoints=checkpoints, **kwargs)
 
         return Wallet(transactions, account_labels, budget_monthly, budget_yearly)
@@ -0,0 +1,127 @@
+import re
+from datetime import datetime
+from typing import List, Dict
+
+# Precompiled patterns
+re_date = re.compile(r"([0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9])")
+re_labels = re.compile(r"(?>:(\S))(.*?)(?=(\S):)")
+
+
+def find_dates(line: str) -> List[str]:
+    """
+    Find all dates in a line
+
+    :param line: line to process
+    :return: list of dates as YYYY-MM-DD strings
+    """
+    if "-" not in line:  # fast path for lines that cannot contain a date
+        return []
+    return re_date.findall(line)
+
+
+def parse_date(date: str) -> datetime:
+    """
+    Parse a YYYY-MM-DD date found by find_dates, equivalent to datetime.strptime(date, "%Y-%m-%d")
+
+    :param date: date string
+    :return: datetime
+    """
+    return datetime(int(date[0:4]), int(date[5:7]), int(date[8:10]))
+
+
+def _find_labels(msg: str) -> List[str]:
+    """
+    Find labels in a comment (:LABEL1:LABEL2:)
+
+    :param msg: comment text
+    :return: list of labels
+    """
+    if msg.count(":") < 2:  # fast path for "Key: Value" comments, a label needs two colons
+        return []
+    return ["".join(e) for e in re_labels.findall(msg)]
+
+
+def _find_tag(msg: str) -> str:
+    """
+    Find a tag at the beginning of a comment, equivalent to the pattern (^[A-z].*\\S:)
+
+    :param msg: stripped comment text
+    :return: tag including the trailing colon or None
+    """
+    if not msg or not "A" <= msg[0] <= "z":
+        return None
+
+    i = msg.rfind(":")
+    while i >= 2:
+        if not msg[i - 1].isspace():
+            return msg[:i + 1]
+        i = msg.rfind(":", 0, i)
+
+    return None
+
+
+def split_comments(line: str) -> (List[str], Dict[str, str], List[str]):
+    """
+    Extract comments, tags and labels from a line
+
+    :param line: line to process
+    :return: labels, properties and comments
+    """
+    labels = []
+    properties = {}
+    comments = []
+
+    if ";" not in line:
+        return labels, properties, comments
+
+    messages = line.strip().split(";")[1:]
+    for message in messages:
+        msg = message
+
+        # Check for labels
+        potential_labels = _find_labels(msg)
+        if len(potential_labels) > 0:
+            labels.extend(potential_labels)
+            for label in potential_labels:
+                msg = msg.replace(label + ":", "")
+        msg = msg.replace(" :", "").strip()
+
+        # Check for a tag with a value
+        tag = _find_tag(msg)
+        if tag is not None:
+            value = msg[len(tag):].strip()
+            name = tag.replace(":", "").strip()
+            properties[name] = value
+            msg = msg.replace(tag, "")
+            msg = msg.replace(value, "")
+
+        if msg.strip():
+            comments.append(msg.strip())
+
+    return labels, properties, comments
+
+
+def split_transfer(line: str) -> (str, List[str], List[str], Dict[str, str], List[str]):
+    """
+    Split a transfer line into the account, value fields, labels, tags and comments
+
+    :param line: stripped line to process
+    :return: account, fields, labels, tags, comments
+    """
+    # Check for labels, tags and comments
+    l, t, c = split_comments(line)
+
+    if l or t or c:
+        entry = line.split(";")[0]
+    else:
+        entry = line
+
+    # Account is separated from values by at least two spaces
+    i = entry.find("  ")
+    account = entry[:i] if i >= 0 else entry
+    rest = entry[len(account):]
+    if account and account in rest:
+        rest = rest.replace(account, "")
+    fields = [f for f in rest.split(" ") if f]
+
+    return account, fields, l, t, c
@@ -1,10 +1,12 @@
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, TextIO
 from wallet_keeper.modules.translator.writers.base import WriterBase
 from wallet_keeper.modules.core.transaction import Transaction
 from wallet_keeper.modules.core.transfer import Transfer
 from datetime import datetime
+import os
 import re
 from wallet_keeper.utils.collection import *
 
@@ -25,121 +27,162 @@ class WriterLedger(WriterBase):
     def __init__(self):
         pass
 
+    buffer_size = 1 << 16  # bytes buffered per output file before flushing
+
     @staticmethod
-    def _write_transfer(transfer: Transfer) -> List[str]:
+    def _sorted_items(properties: Dict[str, str]):
+        """
+        Get properties in the order in which they are written
+
+        :param properties: properties
+        :return: iterable of name and value pairs
+        """
+        return sorted(properties.items()) if len(properties) > 1 else properties.items()
+
+    @staticmethod
+    def _write_transfer(transfer: Transfer, out: TextIO):
         """
         Write a single transfer
 
         :param transfer: transfer
-        :return: list of lines
+        :param out: stream to write to
+        :return:
         """
-        lines = []
-
         if not transfer.amount:
-            lines.append(
-                "{:4}{:40}{:10} {} \n".format("", transfer.account, "", ""))
+            out.write("{:4}{:40}{:10} {} \n".format("", transfer.account, "", ""))
         elif transfer.amount == transfer.price:
-            lines.append(
-                "{:4}{:40}{:10.2f} {} \n".format("", transfer.account,
-                                                 transfer.amount.value, transfer.amount.currency))
+            out.write("{:4}{:40}{:10.2f} {} \n".format("", transfer.account,
+                                                       transfer.amount.value, transfer.amount.currency))
         elif transfer.price:
-            lines.append(
-                "{:4}{:40}{:10.4f} {} @@ {:.4f} {}\n".format("", transfer.account,
-                                                            transfer.amount.value, transfer.amount.currency,
-                                                            transfer.price.value, transfer.price.currency))
+            out.write("{:4}{:40}{:10.4f} {} @@ {:.4f} {}\n".format("", transfer.account,
+                                                                  transfer.amount.value, transfer.amount.currency,
+                                                                  transfer.price.value, transfer.price.currency))
         else:
             raise ValueError("Un-allowed amount definition in a transfer {}".format(transfer.amount))
 
         # Add comments
         for comment in transfer.comments:
-            lines.append("{:4}{} {}\n".format("", ";", comment))
+            out.write("{:4}{} {}\n".format("", ";", comment))
 
         # Add tags/labels
         if len(transfer.labels) > 0:
-            lines.append("{:4}{} :{}:\n".format("", ";", ":".join(transfer.labels)))
+            out.write("{:4}{} :{}:\n".format("", ";", ":".join(transfer.labels)))
 
         # Add properties
-        for name, prop in dict(sorted(transfer.properties.items())).items():
-            lines.append("{:4}{} {}: {}\n".format("", ";", name, prop))
-
-        return lines
+        for name, prop in WriterLedger._sorted_items(transfer.properties):
+            out.write("{:4}{} {}: {}\n".format("", ";", name, prop))
 
     @staticmethod
-    def _write_transaction(trans: Transaction) -> List[str]:
+    def _write_transaction(trans: Transaction, out: TextIO):
         """
-        Write lines of a single transaction
+        Write a single transaction
 
         :param trans: transaction
-        :return: list of lines
+        :param out: stream to write to
+        :return:
         """
-        lines = []
-
         # First line
         date2 = trans.book_date.strftime("%Y-%m-%d")
         if trans.trans_date:
             date1 = trans.trans_date.strftime("%Y-%m-%d")
-            lines.append("{}={} {}\n".format(date1, date2, trans.name))
+            out.write("{}={} {}\n".format(date1, date2, trans.name))
         else:
-            lines.append("{} {}\n".format(date2, trans.name))
+            out.write("{} {}\n".format(date2, trans.name))
 
         # Add comments
         for comment in trans.comments:
-            lines.append("{:4}{} {}\n".format("", ";", comment))
+            out.write("{:4}{} {}\n".format("", ";", comment))
 
         # Add tags/labels
         if len(trans.labels) > 0:
-            lines.append("{:4}{} :{}:\n".format("", ";", ":".join(trans.labels)))
+            out.write("{:4}{} :{}:\n".format("", ";", ":".join(trans.labels)))
 
         # Add properties
-        for name, prop in dict(sorted(trans.properties.items())).items():
-            lines.append("{:4}{} {}: {}\n".format("", ";", name, prop))
+        for name, prop in WriterLedger._sorted_items(trans.properties):
+            out.write("{:4}{} {}: {}\n".format("", ";", name, prop))
 
         for transfer in trans.transfers:
-            lines.extend(WriterLedger._write_transfer(transfer))
+            WriterLedger._write_transfer(transfer, out)
 
-        lines.append("\n")  # add an empty line
+        out.write("\n")  # add an empty line
 
-        return lines
+    @staticmethod
+    def _get_group(trans: Transaction) -> str:
+        """
+        Get the group, and thereby the file, a transaction is written to
+
+        :param trans: transaction
+        :return: lowercased group name
+        """
+        group = trans.properties.get(cs_prop_group)
+        return group.lower() if group is not None else "ungrouped"
 
     @staticmethod
-    def _write(wallet, **kwargs) -> Dict[str, List[str]]:
+    def _write_file(file: Path, transactions: List[Transaction]) -> Path:
         """
-        Write processed data to a file
+        Write transactions of a single group into a buffered file
+
+        :param file: file to write
+        :param transactions: transactions in the order in which they are written
+        :return: file written
+        """
+        with open(file, "w", buffering=WriterLedger.buffer_size) as out:
+            for trans in transactions:
+                WriterLedger._write_transaction(trans, out)
+
+        return file
+
+    @staticmethod
+    def _write_parallel(wallet, path: Path, prefix: str = "", workers: int = None) -> List[Path]:
+        """
+        Write the file of each group in a process pool
 
         :param wallet: wallet with data
         :param path: path to the directory to write to
         :param prefix: tag to add to the generated file names
-        :param kwargs: reader specific arguments
+        :param workers: number of worker processes, defaults to the number of processors
         :return: list of files written
         """
-        files = defaultdict(list)
-        group_by = cs_prop_group
+        groups = {}
         for trans in wallet.transactions:
-            lines = WriterLedger._write_transaction(trans)
-            group = trans.properties[group_by].lower() if group_by in trans.properties.keys() else "ungrouped"
-            if group not in files.keys():
-                files.update({group: lines})
-            else:
-                files[group].extend(lines)
+            groups.setdefault(WriterLedger._get_group(trans), []).append(trans)
 
-        return files
+        files = [path / "{}{}".format(prefix, group) for group in groups]
+        if len(groups) < 2:
+            return [WriterLedger._write_file(file, transactions) for file, transactions in zip(files, groups.values())]
+
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(groups))) as executor:
+            return list(executor.map(WriterLedger._write_file, files, groups.values()))
 
     @staticmethod
-    def write(wallet, path: Path, prefix: str = "", **kwargs) -> List[str]:
+    def write(wallet, path: Path, prefix: str = "", parallel=False, workers: int = None, **kwargs) -> List[str]:
         """
         Write processed data to a file
 
+        Transactions are streamed into one buffered file per group, so the formatted text is never held in memory
+        as a whole.
+
         :param wallet: wallet with data
         :param path: path to the directory to write to
         :param prefix: tag to add to the generated file names
+        :param parallel: format and write the file of each group in a process pool
+        :param workers: number of worker processes for the parallel mode
         :param kwargs: reader specific arguments
         :return: list of files written
         """
-        files = WriterLedger._write(wallet, **kwargs)
+        if parallel:
+            return WriterLedger._write_parallel(wallet, path, prefix, workers)
+
         output = []
-        for key, text in files.items():
-            output.append(path / "{}{}".format(prefix, key))
-            with open(output[-1], "w") as f:
-                f.writelines(text)
+        streams = {}
+        with ExitStack() as stack:
+            for trans in wallet.transactions:
+                group = WriterLedger._get_group(trans)
+                out = streams.get(group)
+                if out is None:
+                    output.append(path / "{}{}".format(prefix, group))
+                    out = stack.enter_context(open(output[-1], "w", buffering=WriterLedger.buffer_size))
+                    streams[group] = out
+                WriterLedger._write_transaction(trans, out)
 
         return output
@@ -38,6 +38,32 @@ def make_month_selector():
     return html.Div([html.H5("Select month range:"), selector])
 
 
+@processing.frame
+def monthly_frame(month_start, month_end) -> pandas.DataFrame:
+    # Apply accounting range
+    dmin = datetime.strptime(month_start, "%m/%Y")
+    dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
+
+    # Monthly totals of accounts with a category, summed up over currencies
+    df = processing.get_monthly_totals(start_date=dmin, end_date=dmax)
+    df = df[df["category"].notnull()]
+    df = df.groupby(["date", "account", "category"], sort=False)["total"].sum().reset_index()
+
+    return df
+
+
+@processing.frame
+def totals_frame(month_start, month_end) -> pandas.DataFrame:
+    # Apply accounting range
+    dmin = datetime.strptime(month_start, "%m/%Y")
+    dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
+
+    # Prepare dataframe
+    df = processing.get_account_totals(start_date=dmin, end_date=dmax, hierarchy=True)
+
+    return df
+
+
 # Dataframe for monthly analytics
 @callback(
     Output('data_monthly', 'data'),
@@ -45,58 +71,14 @@ def make_month_selector():
     Input("select_month_range_end", "value"),
 )
 def filter_dataframe_monthly(month_start, month_end):
-    # Apply accounting range
-    dmin = datetime.strptime(month_start, "%m/%Y")
-    dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
-
-    # Prepare dataframe
-    df, df_tags, df_properties, df_comments = processing.get_transfers(start_date=dmin, end_date=dmax)
-
-    # Apply selection
-    mask = df["category"].notnull()
-    df = df[mask]
-    categories = list(df["category"].unique())
-    accounts = list(df["account"].unique())
-
-    df["year"] = df["date"].apply(lambda x: x.year)
-    df["month"] = df["date"].apply(lambda x: x.month)
-    df = df.groupby(["year", "month", "account", "category"]).agg(
-        total=pandas.NamedAgg(column="price", aggfunc="sum")
-    ).reset_index()
-    df["date"] = df['year'].astype(str) + "-" + df['month'].astype(str)
-    df["date"] = pandas.to_datetime(df["date"], format="%Y-%m")
-
-    df_monthly = pandas.DataFrame()
-    for i, a in enumerate(accounts):
-        acc = accounts[i]
-        n = (dmax.year - dmin.year) * 12 + dmax.month - dmin.month
-        dfm = pandas.DataFrame({
-            "date": [dmin + relativedelta(months=i) for i in range(n + 1)],
-        })
-        dfm["account"] = acc
-        dfm["category"] = processing.get_account_category(acc)
-        dfm["total"] = Decimal(0.0)
-        mask_r = df["account"] == acc
-        mask_l = dfm["date"].isin(df[mask_r]["date"])
-        dfm.loc[mask_l, "total"] = df.loc[mask_r, "total"].values
-        df_monthly = pandas.concat([df_monthly, dfm])
-    df = df_monthly
-
-    return df.to_dict(orient="records")
+    return monthly_frame.handle(month_start, month_end)
 
 
-# Dataframe for monthly analytics
+# Dataframe for account totals
 @callback(
     Output('data_totals', 'data'),
     Input("select_month_range_start", "value"),
     Input("select_month_range_end", "value"),
 )
 def filter_dataframe_totals(month_start, month_end):
-    # Apply accounting range
-    dmin = datetime.strptime(month_start, "%m/%Y")
-    dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
-
-    # Prepare dataframe
-    df = processing.get_account_totals(start_date=dmin, end_date=dmax, hierarchy=True)
-
-    return df.to_dict(orient="records")
+    return totals_frame.handle(month_start, month_end)
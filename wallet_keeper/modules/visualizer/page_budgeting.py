@@ -67,6 +67,35 @@ layout = dbc.Container(
 )
 
 
+@processing.frame
+def budgeting_frame(plus, month_start, month_end) -> pandas.DataFrame:
+    # Apply accounting range
+    dmin = datetime.strptime(month_start, "%m/%Y")
+    dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
+
+    # Prepare dataframe
+    accounts = processing.get_accounts_w_budget()
+    dfb_monthly, dfb_yearly = processing.get_budgets()
+    dfb_monthly = dfb_monthly[["account", "price"]].rename(columns={"price": "monthly"})
+    dfb_yearly = dfb_yearly[["account", "price"]].rename(columns={"price": "yearly"})
+    dfb = pandas.merge(dfb_monthly, dfb_yearly, on="account", how="outer").fillna(0.0).set_index("account")
+
+    # Monthly totals of the selected accounts from the cube, summed up over currencies, months without transfers
+    # are zero
+    selected = [accounts[i] for i in plus]
+    df = processing.get_monthly_totals(start_date=dmin, end_date=dmax)
+    totals = df[df["account"].isin(selected)].groupby(["account", "date"])["total"].sum()
+    index = pandas.MultiIndex.from_product([selected, pandas.date_range(dmin, dmax, freq="MS")],
+                                           names=["account", "date"])
+    df = totals.reindex(index, fill_value=0.0).rename("total").reset_index()[["date", "account", "total"]]
+
+    # Add budget, the yearly budget is spread evenly over the months
+    budget = dfb["monthly"].astype(float) + dfb["yearly"].astype(float) / 12
+    df["budget"] = df["account"].map(budget)
+
+    return df
+
+
 # Dataframe for monthly analytics
 @callback(
     Output('budgeting_data', 'data'),
@@ -76,61 +105,9 @@ layout = dbc.Container(
 )
 def filter_dataframe_monthly(plus, month_start, month_end):
     if not plus:
-        return pandas.DataFrame().to_dict(orient="records")
-
-    # Apply accounting range
-    dmin = datetime.strptime(month_start, "%m/%Y")
-    dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
+        return None
 
-    # Prepare dataframe
-    accounts = processing.get_accounts_w_budget()
-    df, df_tags, df_properties, df_comments = processing.get_transfers(start_date=dmin, end_date=dmax)
-    dfb_monthly, dfb_yearly = processing.get_budgets()
-    dfb_monthly = dfb_monthly[["account", "price"]].rename(columns={"price": "monthly"})
-    dfb_yearly = dfb_yearly[["account", "price"]].rename(columns={"price": "yearly"})
-    dfb = pandas.merge(dfb_monthly, dfb_yearly, on="account", how="outer").fillna(0.0)
-
-    # Apply selection
-    if plus:
-        mask = df["account"].isin([accounts[i] for i in plus])
-        df = df[mask]
-
-    df["year"] = df["date"].apply(lambda x: x.year)
-    df["month"] = df["date"].apply(lambda x: x.month)
-    df = df.groupby(["year", "month", "account"]).agg(
-        total=pandas.NamedAgg(column="price", aggfunc="sum")
-    ).reset_index()
-    df["date"] = df['year'].astype(str) + "-" + df['month'].astype(str)
-    df["date"] = pandas.to_datetime(df["date"], format="%Y-%m")
-
-    df_monthly = pandas.DataFrame()
-    for i in plus:
-        acc = accounts[i]
-        n = (dmax.year - dmin.year) * 12 + dmax.month - dmin.month
-        dfm = pandas.DataFrame({
-            "date": [dmin + relativedelta(months=i) for i in range(n + 1)],
-        })
-        dfm["account"] = acc
-        dfm["total"] = Decimal(0.0)
-
-        # Add budget
-        dfm["budget"] = Decimal(dfb.loc[dfb["account"] == acc, "monthly"].values[0])
-        r = Decimal(0.0)
-        for i, row in dfm.iterrows():
-            if i == 0:
-                r = Decimal(dfb.loc[dfb["account"] == acc, "yearly"].values[0]) / 12
-            elif row["date"].month == 1:
-                r = Decimal(dfb.loc[dfb["account"] == acc, "yearly"].values[0]) / 12
-            dfm.loc[i, "budget"] += r
-
-        # Assign existing values
-        mask_r = df["account"] == acc
-        mask_l = dfm["date"].isin(df[mask_r]["date"])
-        dfm.loc[mask_l, "total"] = df.loc[mask_r, "total"].values
-        df_monthly = pandas.concat([df_monthly, dfm])
-    df = df_monthly
-
-    return df.to_dict(orient="records")
+    return budgeting_frame.handle(plus, month_start, month_end)
 
 
 # History graph
@@ -148,8 +125,7 @@ def display_history(analytics_monthly, month_start, month_end):
     dmin = datetime.strptime(month_start, "%m/%Y")
     dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
 
-    dfm = pandas.DataFrame(analytics_monthly)
-    dfm["date"] = pandas.to_datetime(dfm["date"])
+    dfm = processing.get_frame(analytics_monthly)
 
     # Generate figure
     fig = px.bar(dfm, x="date", y="total", color="account")
@@ -184,8 +160,7 @@ def display_cumulative(analytics_monthly, month_start, month_end):
     dmin = datetime.strptime(month_start, "%m/%Y")
     dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
 
-    dfm = pandas.DataFrame(analytics_monthly)
-    dfm["date"] = pandas.to_datetime(dfm["date"])
+    dfm = processing.get_frame(analytics_monthly)
     for acc, group in dfm.groupby(["account"]):
         dfm.loc[dfm["account"] == acc[0], "total"] = group["total"].cumsum().values
 
@@ -22,7 +22,7 @@ register_page(__name__, path='/', order=1, name="Spending overview")
 )
 def display_bar_totals(data_totals, month_start, month_end):
     # Transfer to dataframe
-    df = pandas.DataFrame(data_totals)
+    df = processing.get_frame(data_totals)
 
     # Transform to datetime format
     dmin = datetime.strptime(month_start, "%m/%Y")
@@ -87,7 +87,7 @@ def display_accounts_sunburst(data_totals, month_start, month_end):
     idx = callback_context.outputs_list['id']['index']  # get id of current callback
 
     # Transfer to dataframe
-    df = pandas.DataFrame(data_totals)
+    df = processing.get_frame(data_totals)
 
     # Transform to datetime format
     dmin = datetime.strptime(month_start, "%m/%Y")
@@ -101,21 +101,9 @@ def display_accounts_sunburst(data_totals, month_start, month_end):
     df["sign"] = df["amount"].apply(lambda x: -1 if x < 0 else 1)
     df["amount"] = df["amount"].abs().apply(lambda x: Decimal(x))
 
-    # Sum up backwards
+    # Sum up leaves for every parent
     if len(df) > 0:
-        # reset parents
-        for j, r in df.iterrows():
-            if r.parent:
-                df.loc[df.account == r.parent, "amount"] = Decimal(0.0)
-
-        for i in list(range(1, max(df.depth) + 1))[::-1]:
-            mask = df.depth == i
-            groups = df[mask].groupby(["account", "currency"])
-            for name, group in groups:
-                parent = ":".join(name[0].split(":")[:-1])
-                if parent:
-                    for j, r in group.iterrows():
-                        df.loc[df.account == parent, "amount"] += Decimal(r.amount)
+        df["amount"] = processing.get_account_hierarchy().sum_leaves(df, "amount")
 
     df.account = df.account.apply(lambda x: x.replace(" ", "_"))
     df["name"] = df.account.apply(lambda x: x.split(":")[-1])
@@ -194,14 +182,11 @@ def display_categories(analytics_monthly, month_start, month_end):
     dmin = datetime.strptime(month_start, "%m/%Y")
     dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
 
-    dfm = pandas.DataFrame(analytics_monthly)
-    dfm["date"] = pandas.to_datetime(dfm["date"])
-
-    dfm = dfm.groupby(["date", "category"]).agg({
-        "total": "sum"
-    }).reset_index()
-    for acc, group in dfm.groupby(["category"]):
-        dfm.loc[dfm["category"] == acc[0], "total"] = group["total"].cumsum().values
+    # Running totals of each category
+    dfm = processing.get_monthly_categories(start_date=dmin, end_date=dmax, cumulative=True)
+    if dfm.empty:
+        return go.Figure()
+    dfm = dfm.groupby(["date", "category"])["total"].sum().reset_index()
 
     # Generate figure
     fig = px.area(dfm, x="date", y="total", color="category")
@@ -222,17 +207,14 @@ def display_categories(analytics_monthly, month_start, month_end):
 def display_cetegory(data_monthly, month_start, month_end):
     idx = callback_context.outputs_list['id']['index']  # get id of current callback
 
-    # Transfer to dataframe
-    df = pandas.DataFrame(data_monthly)
-    df["date"] = pandas.to_datetime(df["date"])
-
     # Transform to datetime format
     dmin = datetime.strptime(month_start, "%m/%Y")
     dmax = datetime.strptime(month_end, "%m/%Y") + relativedelta(months=1) - timedelta(days=1)
 
-    df = df[df["category"] == idx].copy()
-    for acc, group in df.groupby(["account"]):
-        df.loc[df["account"] == acc[0], "total"] = group["total"].cumsum().values
+    # Running totals of the accounts of the category
+    df = processing.get_monthly_totals(start_date=dmin, end_date=dmax, cumulative=True)
+    df = df[df["category"] == idx]
+    df = df.groupby(["date", "account"], sort=False)["total"].sum().reset_index()
 
     # Generate figure
     fig = px.area(df, x="date", y="total", color="account")
@@ -48,7 +48,9 @@ def make_properties_filter():
 cumsum_switch = dcc.Checklist(
     id="cumsum_switch",
     options=[{"label": [html.Span("Cumulative sum", style={"padding-left": 10}),
-                        ], "value": "cumsum"}]
+                        ], "value": "cumsum"},
+             {"label": [html.Span("Running balance", style={"padding-left": 10}),
+                        ], "value": "balance"}]
 )
 
 graph_history = html.Div([
@@ -179,10 +181,19 @@ def make_graph_history(cs, filtered_transactions, filtered_properties, month_sta
     # Compute cumulative sum
     df.loc[:, "cumulative sum"] = df.groupby(["account"]).total.cumsum()
 
+    # Look up balances including all transfers before the range and those filtered out
+    if cs and "balance" in cs:
+        df["balance"] = 0.0
+        for account, group in df.groupby("account"):
+            history = processing.get_balance_history(account, group["date"])
+            df.loc[group.index, "balance"] = history.groupby("date")["balance"].sum().reindex(group["date"]).values
+
     # Generate figure
     y = "total"
     if cs:
-        if "cumsum" in cs:
+        if "balance" in cs:
+            y = "balance"
+        elif "cumsum" in cs:
             y = "cumulative sum"
     fig = go.Figure()
     for name, g in df.groupby(["account"]):
@@ -5,17 +5,186 @@ from pathlib import Path
 from wallet_keeper.modules.translator.factory_reader import factory as factory_reader
 from wallet_keeper.modules.translator.readers.reader_ledger import ReaderLedger
 from wallet_keeper.modules.core.wallet import Wallet
+from wallet_keeper.utils.watcher import FileWatcher
+from collections import OrderedDict
+from functools import wraps
+import inspect
+import threading
 import calendar
 
 # global variables
 wallet = None
+generation = 0  # incremented whenever the wallet is replaced
+
+
+class ResultCache(object):
+    def __init__(self, size: int = 64):
+        """
+        Least recently used cache of query results shared by all callbacks
+
+        Results are keyed by the wallet generation, the query and its arguments, so replacing the wallet makes all
+        previous results unreachable. Data frames are copied on the way out, callers may modify them freely.
+
+        :param size: maximum number of results to keep
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _copy(value):
+        """
+        Copy data frames of a result
+
+        :param value: result or tuple of results
+        :return: copy
+        """
+        if isinstance(value, tuple):
+            return tuple(ResultCache._copy(v) for v in value)
+        if isinstance(value, pandas.DataFrame):
+            return value.copy()
+        return value
+
+    def get(self, key: tuple, compute):
+        """
+        Get a cached result or compute and store it
+
+        :param key: hashable key
+        :param compute: function computing the result
+        :return: result
+        """
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                self._results.move_to_end(key)
+                return self._copy(self._results[key])
+            self.misses += 1
+
+        value = compute()  # outside of the lock, concurrent misses of the same key at worst compute twice
+        with self._lock:
+            self._results[key] = value
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+
+        return self._copy(value)
+
+    def clear(self):
+        """
+        Drop all results
+
+        :return:
+        """
+        with self._lock:
+            self._results.clear()
+
+
+results = ResultCache()
+
+
+def cached(func):
+    """
+    Memoize a query on the current wallet
+
+    :param func: query function
+    :return: wrapped function
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in bound.arguments.items())
+        key = (func.__module__, func.__qualname__, generation, arguments)
+        return results.get(key, lambda: func(*args, **kwargs))
+
+    return wrapper
+
+
+# memoized functions producing data frames shared between callbacks, keyed by name
+frames = {}
+
+
+def frame(func):
+    """
+    Memoize a function producing a data frame for other callbacks
+
+    Instead of the serialized frame, the producing callback puts a small handle naming the function, its arguments
+    and the wallet generation into a store, consuming callbacks fetch the frame in-process with get_frame(). A reload
+    changes the handle, so the store value changes and its consumers fire again. A frame evicted from the cache is
+    recomputed on demand, an outdated handle is answered from the current wallet.
+
+    :param func: function with JSON serializable arguments returning a data frame
+    :return: wrapped function with a handle(*args) method
+    """
+    name = "{}.{}".format(func.__module__, func.__qualname__)
+    wrapper = cached(func)
+    wrapper.handle = lambda *args: {"frame": name, "generation": generation, "args": list(args)}
+    frames[name] = wrapper
+
+    return wrapper
+
+
+def get_frame(handle: dict) -> pandas.DataFrame:
+    """
+    Fetch the data frame of a handle
+
+    :param handle: handle created by the handle() method of a frame function
+    :return: data frame, empty without a handle
+    """
+    if not handle:
+        return pandas.DataFrame()
+
+    return frames[handle["frame"]](*handle["args"])
+
+
+def set_wallet(w: Wallet):
+    """
+    Replace the wallet, invalidating all cached results
+
+    :param w: new wallet
+    :return:
+    """
+    global wallet, generation
+
+    wallet = w
+    generation += 1
+    results.clear()
 
-def prepare(file: Path):
-    global wallet
 
+def load(file: Path, cache: Path = None) -> Wallet:
     # reader = factory_reader.create(ReaderMobusXML.format)
     reader = factory_reader.create(ReaderLedger.format)
-    wallet = reader.read(file, raw=False)
+    w = reader.read(file, raw=False, cache=cache, incremental=True)
+    w.rebuild()  # build the transfer store once at load time
+    return w
+
+
+def prepare(file: Path, cache: Path = None):
+    set_wallet(load(file, cache))
+
+
+def watch(file: Path, cache: Path = None, interval: float = 1.0) -> FileWatcher:
+    """
+    Reload the wallet in a background thread whenever the journal or one of its included files changes
+
+    Only changed files are parsed again, unchanged ones resume from their checkpoints or come from the cache. The
+    new wallet is fully built before it replaces the global one, so callbacks keep using the previous wallet until
+    then.
+
+    :param file: journal file
+    :param cache: directory with a cache of parsed files
+    :param interval: polling interval in seconds
+    :return: running watcher
+    """
+    def reload():
+        set_wallet(load(file, cache))
+
+    watcher = FileWatcher(lambda: ReaderLedger.find_files(file), reload, interval)
+    watcher.start()
+    return watcher
 
 # Establish account hierarchy
 def get_hierarchy(words, delim=":"):
@@ -98,6 +267,7 @@ def explode_accounts(df: pandas.DataFrame):
     return df_new
 
 
+@cached
 def get_transfers(start_date=None, end_date=None):
     global wallet
 
@@ -113,6 +283,7 @@ def get_transfers(start_date=None, end_date=None):
 
     return df, df_tags, df_properties, df_comments
 
+@cached
 def get_budgets():
     global wallet
 
@@ -122,6 +293,7 @@ def get_budgets():
     return dfm, dfy
 
 
+@cached
 def get_time_span():
     global wallet
 
@@ -144,6 +316,13 @@ def get_account_category(acc):
     return wallet.get_account_label(acc)
 
 
+def get_account_hierarchy():
+    global wallet
+
+    return wallet.hierarchy
+
+
+@cached
 def get_account_totals(start_date=None, end_date=None, hierarchy=False):
     global wallet
 
@@ -152,6 +331,54 @@ def get_account_totals(start_date=None, end_date=None, hierarchy=False):
 
     return df
 
+def get_monthly_panel(df: pandas.DataFrame, dmin, dmax, accounts=None) -> pandas.DataFrame:
+    """
+    Sum up transfers per account and month on the full grid of accounts and months
+
+    Months without transfers get a zero total, so every account has a row for every month of the range.
+
+    :param df: transfers with account, date and price columns
+    :param dmin: first day of the first month
+    :param dmax: any day of the last month
+    :param accounts: accounts to include in this order, defaults to the accounts of the transfers
+    :return: DataFrame with date, account and total columns, totals as floats
+    """
+    if accounts is None:
+        accounts = df["account"].unique()
+    months = pandas.date_range(pandas.Timestamp(dmin).to_period("M").to_timestamp(), dmax, freq="MS")
+
+    month = df["date"].dt.to_period("M").dt.to_timestamp()
+    totals = df["price"].astype(float).groupby([df["account"], month]).sum()
+    index = pandas.MultiIndex.from_product([accounts, months], names=["account", "date"])
+    panel = totals.reindex(index, fill_value=0.0).rename("total").reset_index()
+
+    return panel[["date", "account", "total"]]
+
+
+@cached
+def get_monthly_totals(start_date=None, end_date=None, hierarchy=False, cumulative=False):
+    global wallet
+
+    df = wallet.cube.get_monthly(start_date=start_date, end_date=end_date, hierarchy=hierarchy, cumulative=cumulative)
+    df["category"] = df["account"].map(wallet.account_labels if wallet.account_labels else {})
+    return df
+
+
+@cached
+def get_monthly_categories(start_date=None, end_date=None, cumulative=False):
+    global wallet
+
+    df = wallet.cube.get_monthly_by(wallet.account_labels, start_date=start_date, end_date=end_date,
+                                    cumulative=cumulative)
+    return df.rename(columns={"label": "category"})
+
+
+def get_balance_history(account, dates, children=False):
+    global wallet
+
+    return wallet.balances.get_history(account, dates, children=children)
+
+
 def get_first_and_last_day(t0, t1):
     d0 = t0.replace(day=1)
     r1 = calendar.monthrange(t1.year, t1.month)
@@ -165,18 +392,7 @@ def assemble_dataframes():
     # Get totals
     df = get_account_totals()
 
-    # Rebuild hierarchy backwards
-    df["depth"] = df.account.apply(lambda x: x.count(":"))
-    dfn = df.copy()
-
-    for i in list(range(1, max(df.depth) + 1))[::-1]:
-        mask = df.depth == i
-        groups = df[mask].groupby(["account", "currency"])
-        for name, group in groups:
-            parent = ":".join(name[0].split(":")[:-1])
-            dfg = group
-            dfg.account = parent
-            dfg.depth = i - 1
-            dfn = pandas.concat([dfn, dfg])
-
-    return dfn.groupby(["account", "currency", "depth"]).sum().reset_index()
+    # Roll up to parent accounts
+    df = get_account_hierarchy().roll_up(df)
+
+    return df[["account", "currency", "depth", "amount"]]
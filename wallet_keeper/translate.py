@@ -1,16 +1,35 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List
 import os
+import time
 from modules.translator.translations import allowed_translations
 from modules.translator.factory_reader import factory as fr
 from modules.translator.factory_writer import factory as fw
+from modules.translator.processing import process_wallet, RuleCache
+from modules.core.wallet import Wallet
+from modules.core.dedup import FingerprintIndex
 import json
 import glob
 
 
+def _parse(file: Path, reader_format: str, cache: Path = None) -> (Wallet, float):
+    """
+    Parse a single file
+
+    :param file: file to parse
+    :param reader_format: reader to use for reading the file
+    :param cache: directory with a cache of parsed files, used by readers supporting it
+    :return: wallet and parse time in seconds
+    """
+    t0 = time.perf_counter()
+    wallet = fr.create(reader_format).read(Path(file), cache=cache)
+    return wallet, time.perf_counter() - t0
+
+
 def translate(files: List[Path], reader_format: str, writer_format: str, rules: dict, output: Path = None,
-              tag: str = "") -> List[Path]:
+              tag: str = "", cache: Path = None, workers: int = None) -> List[Path]:
     """
     Translate to ledger format
 
@@ -20,17 +39,53 @@ def translate(files: List[Path], reader_format: str, writer_format: str, rules:
     :param rules: dictionary with rules for a deterministic tagging
     :param output: path to an output file
     :param tag: tag to add to the generated file names
+    :param cache: directory with a cache of parsed files, used by readers supporting it
+    :param workers: number of worker processes used by every stage, serial if None or 1
     :return: path to a written database
     """
-    reader = fr.create(reader_format)
+    # Process pools only pay off for large inputs, so they are used on request
+    workers = workers or 1
+
+    # 1. Parse
+    if len(files) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(_parse, files, [reader_format] * len(files), [cache] * len(files)))
+    else:
+        parsed = [_parse(file, reader_format, cache) for file in files]
+
+    # Merge overlapping statements, dropping transactions already imported from a previous file
+    index = FingerprintIndex()
     transactions = []
-    for file in files:
-        # 1. Parse
-        transactions.extend(reader.read(Path(file)))
+    account_labels = {}
+    budget_monthly = None
+    budget_yearly = None
+    duplicates = 0
+    for file, (w, seconds) in zip(files, parsed):
+        print("Parsed {} in {:.3f} s ({} transactions)".format(file, seconds, len(w.transactions)))
+        if w.account_labels:
+            account_labels.update(w.account_labels)
+        budget_monthly = w.budget_monthly or budget_monthly
+        budget_yearly = w.budget_yearly or budget_yearly
+        new, skipped = index.merge(w.transactions)
+        transactions.extend(new)
+        duplicates += len(skipped)
+        for trans in skipped:
+            date = trans.trans_date if trans.trans_date else trans.book_date
+            print("  Skipped duplicate {} {}".format(date.strftime("%Y-%m-%d"), trans.name))
+    print("Skipped {} duplicate transactions".format(duplicates))
+
+    # Sort before the wallet indexes the transactions
+    transactions.sort(key=lambda t: t.trans_date if t.trans_date else t.book_date)
+    wallet = Wallet(transactions, account_labels, budget_monthly, budget_yearly)
+
+    # 2. Apply rules
+    rule_cache = RuleCache(rules)
+    wallet = process_wallet(wallet, rules, workers=workers, cache=rule_cache)
+    print("Rule cache: {} hits, {} misses".format(rule_cache.hits, rule_cache.misses))
 
-    # 2. Write
+    # 3. Write
     writer = fw.create(writer_format)
-    files = writer.write(transactions, rules, output, tag)
+    files = writer.write(wallet, output, tag, parallel=workers > 1, workers=workers)
 
     return files
 
@@ -53,6 +108,10 @@ if __name__ == "__main__":
     parser.add_argument("-o", "--output", dest="output",
                         default=os.getcwd(),
                         help="Output folder to which to write the files")
+    parser.add_argument("-c", "--cache", dest="cache", required=False,
+                        help="Directory with a cache of parsed files")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, required=False,
+                        help="Number of worker processes, runs serially by default")
     args = parser.parse_args()
 
     guide = {}
@@ -60,4 +119,5 @@ if __name__ == "__main__":
         with open(args.guide, 'r') as f:
             guide = json.load(f)
 
-    files = translate(glob.glob(args.pattern), args.reader, args.writer, guide, Path(args.output))
+    files = translate(glob.glob(args.pattern), args.reader, args.writer, guide, Path(args.output),
+                      cache=Path(args.cache) if args.cache else None, workers=args.jobs)
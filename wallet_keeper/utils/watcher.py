@@ -0,0 +1,76 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class FileWatcher(threading.Thread):
+    """
+    Background thread polling a set of files and calling back when any of them changes
+
+    The set of files is recomputed on every poll, so files added to or removed from it (e.g. through include
+    directives) are picked up as well. The callback runs in this thread.
+    """
+
+    def __init__(self, find_files: Callable[[], List[Path]], on_change: Callable[[], None], interval: float = 1.0):
+        """
+        Constructor
+
+        :param find_files: function returning the files to watch
+        :param on_change: function to call after a change was detected
+        :param interval: polling interval in seconds
+        """
+        super().__init__(name="FileWatcher", daemon=True)
+        self.interval = interval
+        self._find_files = find_files
+        self._on_change = on_change
+        self._stop_event = threading.Event()
+        self._stamps = self._get_stamps()
+
+    def _get_stamps(self) -> Dict[Path, tuple]:
+        """
+        Get modification times and sizes of the watched files
+
+        :return: stamps keyed by file, or None if the files cannot be listed right now
+        """
+        try:
+            stamps = {}
+            for file in self._find_files():
+                stat = os.stat(file)
+                stamps[file] = (stat.st_mtime_ns, stat.st_size)
+            return stamps
+        except OSError:
+            return None  # e.g. a file is being replaced, try again on the next poll
+
+    def poll(self) -> bool:
+        """
+        Check the files once and call back if they changed
+
+        :return: true if a change was detected
+        """
+        stamps = self._get_stamps()
+        if stamps is None or stamps == self._stamps:
+            return False
+
+        self._stamps = stamps
+        try:
+            self._on_change()
+        except Exception:
+            logger.exception("Reloading after a change of the watched files failed")
+
+        return True
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
+
+    def stop(self):
+        """
+        Stop watching
+
+        :return:
+        """
+        self._stop_event.set()
@@ -1,6 +1,7 @@
 import re
 import xml.etree.ElementTree as ET
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
 
 
 def get_namespace(element) -> str:
@@ -8,6 +9,91 @@ def get_namespace(element) -> str:
     return (m.group(0) if m else '').lstrip("{").rstrip("}")
 
 
+@lru_cache(maxsize=1024)
+def _resolve_path(address: str, namespaces: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Replace namespace prefixes of a path by the Clark notation
+
+    :param address: path with prefixes, e.g. ns:Sts/ns:Cd
+    :param namespaces: namespace items
+    :return: path with {namespace}tag steps
+    """
+    for key, ns in namespaces:
+        address = address.replace(key + ":", "{" + ns + "}")
+    return address
+
+
+def resolve_path(address: str, namespaces: Dict[str, str]) -> str:
+    """
+    Replace namespace prefixes of a path by the Clark notation, results are cached
+
+    :param address: path with prefixes, e.g. ns:Sts/ns:Cd
+    :param namespaces: dictionary of namespaces that are used in the address
+    :return: path with {namespace}tag steps
+    """
+    return _resolve_path(address, tuple(namespaces.items()))
+
+
+class PathSelector(object):
+    def __init__(self, paths: Dict[str, str], namespaces: Dict[str, str], optional: Iterable[str] = (),
+                 multiple: Iterable[str] = ()):
+        """
+        Compile simple paths (tag/tag/...) into a trie to select all of them in a single traversal
+
+        Each step takes the first child with the tag, only the last step of a path in multiple collects all.
+
+        :param paths: paths with prefixes keyed by name
+        :param namespaces: dictionary of namespaces that are used in the paths
+        :param optional: names of paths which do not have to be present
+        :param multiple: names of paths to collect all elements for
+        """
+        self.paths = {name: resolve_path(address, namespaces) for name, address in paths.items()}
+        self.optional = set(optional)
+        self.multiple = set(multiple)
+        self._trie = {}
+        for name, path in self.paths.items():
+            node = self._trie
+            steps = path.split("/")
+            for j, step in enumerate(steps):
+                names, node = node.setdefault(step, ([], {}))
+                if j == len(steps) - 1:
+                    names.append(name)
+
+    def _visit(self, element: ET.Element, node: dict, result: dict):
+        seen = set()
+        for child in element:
+            tag = child.tag
+            if tag not in node:
+                continue
+
+            names, children = node[tag]
+            first = tag not in seen
+            seen.add(tag)
+            for name in names:
+                if name in self.multiple:
+                    result[name].append(child)
+                elif first:
+                    result[name] = child
+            if first and children:
+                self._visit(child, children, result)
+
+    def select(self, element: ET.Element) -> Dict[str, ET.Element]:
+        """
+        Select elements
+
+        :param element: xml element to which the paths are relative
+        :return: element keyed by name, None for missing optional ones and a list for multiple ones
+        """
+        result = {name: [] if name in self.multiple else None for name in self.paths}
+        self._visit(element, self._trie, result)
+
+        for name, entry in result.items():
+            if entry is None and name not in self.optional:
+                raise AttributeError("{} doesn't include {}".format(element.tag, self.paths[name]))
+
+        return result
+
+
 def get_element(element: ET.Element, address: str, namespaces: Dict[str, str], empty: bool = False) -> ET.Element:
     """
     Get an element value
@@ -18,15 +104,13 @@ def get_element(element: ET.Element, address: str, namespaces: Dict[str, str], e
     :param empty: flag to allow empty fields
     :return:
     """
-    entry = element.find(address, namespaces)
+    resolved = resolve_path(address, namespaces)
+    entry = element.find(resolved)
     if entry is not None:
         return entry
     elif empty:
         return None
     else:
-        resolved = address
-        for key, ns in namespaces.items():
-            resolved = resolved.replace(key + ":", "{" + ns + "}")
         raise AttributeError("{} doesn't include {}".format(element.tag, resolved))
 
 
@@ -14,9 +14,16 @@ if __name__ == '__main__':
         prog='prepare',
         description='Visualize contents of a Mobus journal')
     parser.add_argument("file", help="Path to a Mobus journal file")
+    parser.add_argument("-c", "--cache", dest="cache", required=False,
+                        help="Directory with a cache of parsed journal files")
+    parser.add_argument("-w", "--watch", dest="watch", action="store_true",
+                        help="Reload the journal when it or one of its included files changes")
     args = parser.parse_args()
 
-    processing.prepare(Path(args.file))
+    cache = Path(args.cache) if args.cache else None
+    processing.prepare(Path(args.file), cache)
+    if args.watch:
+        processing.watch(Path(args.file), cache)
     # processing.assemble_dataframes()
 
     # Run application